@@ -1,11 +1,29 @@
+import datetime
+import hmac
+import os
+import uuid
+
 import streamlit as st
-import pandas as pd
-import matplotlib.pyplot as plt
-import matplotlib.font_manager as fm
-import platform
 import numpy as np
+import pandas as pd
+
+import catalog
+import charts
+import gap_analysis
+import history
+import perf
+import recommender
+import render
+import search
+import stat_data
+
+# rerun 한 번 전체 시간 (fragment 만 다시 실행될 때는 해당 구간만 기록된다)
+_rerun = perf.section('app.rerun').start()
 
 # --- 1. 기본 설정 ---
+# 아이콘 등 정적 파일은 저장소에 포함해 외부 CDN 없이(오프라인에서도) 표시한다
+ICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'icons')
+
 st.set_page_config(
     page_title="내 손안의 헬스 매니저 (Care Ver.)",
     page_icon="🌿",
@@ -14,6 +32,7 @@ st.set_page_config(
 )
 
 # --- [디자인] 커스텀 CSS 주입 (가독성 및 입력창 긴급 수정) ---
+@perf.timed('app.local_css')
 def local_css():
     st.markdown("""
         <style>
@@ -102,6 +121,15 @@ def local_css():
         .warning-card h4, .warning-card p, .warning-card span, .warning-card b {
             color: #c53030 !important;
         }
+        /* 영양제 간 상호작용 (주의: 주황, 권장: 파랑) */
+        .interaction-card.conflict {
+            background-color: #fffaf0 !important;
+            border-left: 6px solid #dd6b20;
+        }
+        .interaction-card.synergy {
+            background-color: #ebf8ff !important;
+            border-left: 6px solid #3182ce;
+        }
 
         /* [6] 버튼 스타일 */
         .stButton>button {
@@ -129,153 +157,154 @@ def local_css():
 
 local_css()
 
-# 그래프 한글 폰트 설정
-system_name = platform.system()
-if system_name == 'Windows':
-    plt.rc('font', family='Malgun Gothic')
-elif system_name == 'Darwin': 
-    plt.rc('font', family='AppleGothic')
-else:
-    plt.rc('font', family='NanumGothic')
-plt.rc('axes', unicode_minus=False)
-
 # --- 2. 데이터 로드 ---
-@st.cache_data
-def load_stat_data():
-    try:
-        try:
-            df = pd.read_csv('supplements.csv', header=1, encoding='cp949') 
-        except:
-            df = pd.read_csv('supplements.csv', header=1, encoding='utf-8')
-        
-        df.columns = [c.replace('"', '').strip() for c in df.columns]
-        
-        if '평균' in df.columns:
-            df['평균'] = pd.to_numeric(df['평균'], errors='coerce')
-            
-        return df
-    except Exception as e:
-        return pd.DataFrame()
-
-# [DB] 영양제 정보
-PRODUCT_DB = {
-    '비타민C': {
-        'name': '고려은단 비타민C 1000',
-        'desc': '활성산소 케어 & 면역 충전',
-        'detail': '강력한 항산화 작용으로 피로를 개선하고 면역력을 높여줍니다.',
-        'link': 'https://search.shopping.naver.com/search/all?query=비타민C',
-        'symptoms': ['피로', '면역력 저하', '감기 기운', '잇몸 출혈'],
-        'purposes': ['활력 증진', '피부 미용', '항산화 케어'],
-        'dosage_daily': '1,000mg',
-        'directions': '산성이 강하므로 **식사 중**이나 **식후**에 섭취하세요.',
-        'contraindications': ['신장질환', '위장장애', '요로결석'],
-        'risk_msg': '신장 결석 이력이 있거나 위장이 약한 경우 주의가 필요합니다.',
-        'stat_keyword': '비타민C'
-    },
-    '티아민': {
-        'name': '임팩타민 (비타민B 컴플렉스)',
-        'desc': '지친 일상에 에너지 부스팅',
-        'detail': '탄수화물을 에너지로 변환하여 만성 피로 회복을 돕습니다.',
-        'link': 'https://search.shopping.naver.com/search/all?query=비타민B',
-        'symptoms': ['만성 피로', '무기력', '어깨 결림', '식욕 부진'],
-        'purposes': ['활력 증진', '체력 보강', '수험생/직장인 케어'],
-        'dosage_daily': '50~100mg',
-        'directions': '활력을 위해 **아침 식후** 섭취를 권장합니다.',
-        'contraindications': ['위장장애'], 
-        'risk_msg': '고함량 복용 시 속쓰림이 발생할 수 있습니다.',
-        'stat_keyword': '티아민'
-    },
-    '비타민A': {
-        'name': '루테인 지아잔틴',
-        'desc': '침침한 눈을 선명하게',
-        'detail': '황반 색소 밀도를 유지하여 눈 건강과 시력 보호에 도움을 줍니다.',
-        'link': 'https://search.shopping.naver.com/search/all?query=루테인',
-        'symptoms': ['눈 건조', '침침함', '야맹증', '시력 저하'],
-        'purposes': ['눈 건강', '노화 방지'],
-        'dosage_daily': '20mg (루테인)',
-        'directions': '지용성이므로 **식사 직후** 섭취 시 흡수율이 높습니다.',
-        'contraindications': ['간 질환', '임산부', '흡연자'], 
-        'risk_msg': '장기 과다 섭취 및 흡연자의 고용량 섭취 시 주의가 필요합니다.',
-        'stat_keyword': '비타민A'
-    },
-    '칼슘': {
-        'name': '종근당 칼슘 마그네슘 D',
-        'desc': '뼈 건강과 편안한 숙면',
-        'detail': '뼈와 치아를 형성하고 신경 안정 작용을 합니다.',
-        'link': 'https://search.shopping.naver.com/search/all?query=칼슘마그네슘',
-        'symptoms': ['관절 통증', '눈 밑 떨림', '불면증', '골다공증'],
-        'purposes': ['뼈 건강', '성장 발육', '심신 안정'],
-        'dosage_daily': '700~800mg',
-        'directions': '근육 이완을 위해 **저녁 식후** 섭취가 좋습니다.',
-        'contraindications': ['신장질환', '심혈관질환', '변비'],
-        'risk_msg': '신장 기능 저하 시 고칼슘혈증 위험이 있습니다.',
-        'stat_keyword': '칼슘'
-    },
-    '철': {
-        'name': '훼라민Q (철분제)',
-        'desc': '빈혈 예방과 산소 공급',
-        'detail': '혈액 생성을 돕고 체내 산소 운반을 원활하게 합니다.',
-        'link': 'https://search.shopping.naver.com/search/all?query=철분제',
-        'symptoms': ['빈혈', '어지러움', '창백함', '두통'],
-        'purposes': ['임산부 케어', '빈혈 예방'],
-        'dosage_daily': '10~14mg',
-        'directions': '**공복**에 **비타민C(오렌지주스)**와 함께 드세요.',
-        'contraindications': ['위장장애', '간 질환'],
-        'risk_msg': '위 점막 자극 및 변비 발생 가능성이 있습니다.',
-        'stat_keyword': '철'
-    },
-    '마그네슘': {
-        'name': '닥터스베스트 마그네슘',
-        'desc': '근육 이완과 스트레스 완화',
-        'detail': '신경과 근육 기능을 유지하고 눈 떨림을 방지합니다.',
-        'link': 'https://search.shopping.naver.com/search/all?query=마그네슘',
-        'symptoms': ['눈 밑 떨림', '근육 경련', '불면증', '스트레스'],
-        'purposes': ['심신 안정', '근육 이완', '수면 질 개선'],
-        'dosage_daily': '315mg',
-        'directions': '취침 1시간 전 섭취 시 숙면에 도움됩니다.',
-        'contraindications': ['신장질환', '서맥'],
-        'risk_msg': '신장 배설 기능 저하 시 주의가 필요합니다.',
-        'stat_keyword': '마그네슘'
-    }
-}
-
-stat_df = load_stat_data()
+@st.cache_resource
+def load_stat_store():
+    # cache_data 와 달리 세션마다 DataFrame 을 복사하지 않고, 프로세스 전체가
+    # 읽기 전용 배열(가능하면 메모리 매핑된 스냅샷) 하나를 함께 쓴다
+    return stat_data.load_stat_store()
+
+@st.cache_resource
+def load_stat_cube():
+    # 연도 x 성별 x 연령대 x 영양소 x 세부 구분 배열. 단면/추이 조회는 인덱싱만 한다
+    with perf.section('stat_data.StatCube'):
+        return stat_data.StatCube(load_stat_store())
+
+@st.cache_resource
+def load_stat_index(year=None, age=None):
+    # (성별, 영양소, 세부 구분) 조회 테이블은 단면(연도, 연령대)마다 한 번만 만든다.
+    # 기본값은 최신 연도의 연령 구분 없는 단면
+    return stat_data.StatIndex(load_stat_cube(), year, age)
+
+@st.cache_resource
+def load_gap_model():
+    # 성별 x 영양소 평균/표준오차 행렬 (갭 분석용)
+    return gap_analysis.GapModel(load_stat_index())
+
+@st.cache_resource
+def catalog_watcher():
+    # 증상/목적/질환 ID 와 제품 행렬은 카탈로그가 바뀌지 않는 한 한 번만 컴파일한다.
+    # products.json 이 바뀌면 다음 조회 때 새 엔진으로 통째로 교체된다 (세션 유지).
+    return catalog.CatalogWatcher(build=recommender.CatalogEngine)
+
+def current_engine():
+    return catalog_watcher().current()
+
+@st.cache_resource(max_entries=2)
+def symptom_index(version, _engine):
+    # 자유 입력 증상 검색용 n-gram 역색인. 카탈로그 버전마다 한 번만 만들고 모든 세션이 함께 쓴다
+    return search.build_index(_engine)
+
+@st.cache_resource
+def prescription_cache():
+    # 같은 (성별, 질환, 증상, 목표) 조합의 처방 결과를 모든 세션이 함께 재사용한다
+    return recommender.PrescriptionCache(maxsize=2048, ttl=600)
+
+@st.cache_resource
+def history_store():
+    # 처방 기록은 프로세스당 writer 스레드 하나가 모아서 쓴다 (버튼 핸들러는 큐에 넣기만 한다)
+    return history.HistoryStore()
+
+@st.cache_data(max_entries=8)
+def render_macro_pie(version, _stat_index, gender):
+    # 같은 데이터 버전(내용 해시)에서는 한 번만 그리고 이후에는 PNG 바이트만 돌려준다
+    perf.note_miss()
+    sizes = charts.macro_data(_stat_index, gender)
+    return charts.macro_pie_png(sizes) if sizes else None
+
+@st.cache_data(max_entries=8)
+def render_gender_bar(version, _stat_index):
+    perf.note_miss()
+    labels, male_vals, female_vals = charts.gender_compare_data(_stat_index)
+    return charts.gender_bar_png(labels, male_vals, female_vals) if labels else None
+
+stat_index = load_stat_index()
+
+def data_error_message():
+    # 통계표를 읽지 못한 사유 (예: 스키마 검증 실패) 가 있으면 함께 보여 준다
+    return f"데이터 로드 실패: {stat_data.last_error}" if stat_data.last_error else "데이터 로드 실패"
 
 # --- 3. 사이드바 ---
-with st.sidebar:
-    st.image("https://cdn-icons-png.flaticon.com/512/3004/3004458.png", width=80)
+# 메인 화면의 각 탭은 st.fragment 로 분리되어 있어 위젯을 조작하면 해당 영역만 다시 실행된다.
+# 사이드바의 환자 정보는 모든 탭이 읽으므로 fragment 로 두지 않는다 (바꾸면 앱 전체가 한 번 실행된다).
+# 영역 간에 필요한 값(환자 정보)은 위젯 key 를 통해 st.session_state 로만 주고받는다.
+PATIENT_DEFAULTS = {'patient_name': "김철도", 'patient_age': 37, 'patient_gender': "남자", 'patient_diseases': []}
+
+def current_patient():
+    ss = st.session_state
+    return {key: ss.get(key, default) for key, default in PATIENT_DEFAULTS.items()}
+
+HISTORY_SESSION_PARAM = 'sid'
+
+def history_session():
+    # 처방 기록에 남기는 브라우저 세션 ID. 일반 사용자는 이 ID 의 기록만 조회한다.
+    # st.session_state 는 새로고침하면 사라지므로 주소(?sid=) 에도 두어 유지한다
+    # (무작위 128비트 값이라 다른 사람의 ID 를 추측할 수 없다)
+    sid = st.session_state.get('history_session') or st.query_params.get(HISTORY_SESSION_PARAM, '')
+    try:
+        valid = uuid.UUID(hex=sid).hex == sid
+    except ValueError:
+        valid = False
+    if not valid:
+        sid = uuid.uuid4().hex
+    st.session_state['history_session'] = sid
+    if st.query_params.get(HISTORY_SESSION_PARAM) != sid:
+        st.query_params[HISTORY_SESSION_PARAM] = sid
+    return sid
+
+# 관리자 기능 (성능 패널, 전체 처방 기록 조회) 은 환경 변수 HEALTH_ADMIN_TOKEN 을
+# 설정하고 ?admin=<토큰> 으로 접속했을 때만 열린다
+ADMIN_TOKEN_ENV = 'HEALTH_ADMIN_TOKEN'
+
+def is_admin():
+    token = os.environ.get(ADMIN_TOKEN_ENV)
+    # 문자열 비교는 ASCII 가 아니면 TypeError 를 내므로 (예: ?admin=관리자) 바이트로 비교한다
+    return bool(token) and hmac.compare_digest(st.query_params.get('admin', '').encode(), token.encode())
+
+def patient_chart():
+    st.image(os.path.join(ICON_DIR, 'patient_chart.svg'), width=80)
     st.markdown("## 📋 Patient Chart")
     st.caption("환자 정보를 입력하세요.")
     st.markdown("---")
     
-    name = st.text_input("성명 (Name)", value="김철도")
+    name = st.text_input("성명 (Name)", value=PATIENT_DEFAULTS['patient_name'], key='patient_name')
     c1, c2 = st.columns(2)
     with c1:
-        age = st.number_input("나이", min_value=1, max_value=100, value=37)
+        st.number_input("나이", min_value=1, max_value=100, value=PATIENT_DEFAULTS['patient_age'], key='patient_age')
     with c2:
-        gender_input = st.selectbox("성별", ["남자", "여자"])
+        st.selectbox("성별", ["남자", "여자"], key='patient_gender')
     
     st.markdown("---")
     st.markdown("### ⚠️ Medical History")
     st.caption("안전한 처방을 위해 기저 질환을 체크해주세요.")
     disease_list = ['위장장애', '신장질환', '간 질환', '심혈관질환', '당뇨', '요로결석', '임산부', '흡연자', '빈혈', '없음']
-    user_diseases = st.multiselect("보유 질환 선택", disease_list)
+    st.multiselect("보유 질환 선택", disease_list, key='patient_diseases')
     
     st.markdown("---")
     st.success(f"**{name}**님 진료 준비 완료.\n오른쪽 화면에서 증상을 선택하세요.")
 
+with st.sidebar:
+    patient_chart()
+
 # --- 4. 메인 화면 ---
 col_title1, col_title2 = st.columns([1, 6])
 with col_title1:
-    st.image("https://cdn-icons-png.flaticon.com/512/2966/2966334.png", width=70)
+    st.image(os.path.join(ICON_DIR, 'app_logo.svg'), width=70)
 with col_title2:
     st.title("Dr. Health Manager")
     st.markdown("##### :leaves: 당신의 건강을 위한 맞춤형 AI 처방 시스템")
 
-tab1, tab2, tab3 = st.tabs(["🩺 AI 처방 & 안전 분석", "💊 구매처 안내", "📊 건강 데이터 분석"])
+tab1, tab2, tab3, tab4, tab5 = st.tabs(["🩺 AI 처방 & 안전 분석", "💊 구매처 안내", "📊 건강 데이터 분석", "🧪 영양 갭 분석", "🗂️ 처방 기록"])
 
 # --- TAB 1 ---
-with tab1:
+@st.fragment
+def questionnaire():
+    patient = current_patient()
+    name, gender_input, user_diseases = patient['patient_name'], patient['patient_gender'], patient['patient_diseases']
+    engine = current_engine()
+    # TAB 4 갭 분석에서 찾은 부족 영양소 (없으면 빈 dict)
+    gap_intake = st.session_state.get('gap_intake', {})
+
     st.markdown("<br>", unsafe_allow_html=True)
     
     with st.container():
@@ -286,117 +315,82 @@ with tab1:
             </div>
         """, unsafe_allow_html=True)
         
+        st.markdown("#### 🔎 불편한 점을 자유롭게 적어 주세요")
+        query = st.text_input("예: 눈이 뻑뻑해요, 잠이 안 와요", key='symptom_query').strip()
+        searched = []
+        if query:
+            with perf.section('tab1.symptom_search'):
+                hits = symptom_index(engine.version, engine).search(query)
+            if hits:
+                labels = {f"{h['term']} ({'증상' if h['kind'] == 'symptom' else '목표'})": h for h in hits}
+                # 질의가 바뀌면 새 위젯이 되어 찾은 항목 전체가 다시 기본 선택된다
+                picked = st.multiselect("검색으로 찾은 항목 (맞지 않는 항목은 지워 주세요)", list(labels),
+                                        default=list(labels), key=f'symptom_hits_{query}')
+                searched = [labels[label] for label in picked]
+            else:
+                st.caption("일치하는 증상을 찾지 못했습니다. 아래 목록에서 직접 골라 주세요.")
+
         col1, col2 = st.columns(2)
         with col1:
             st.markdown("#### 1. 주요 증상 (Symptoms)")
-            all_symptoms = set()
-            for info in PRODUCT_DB.values():
-                all_symptoms.update(info['symptoms'])
-            selected_symptoms = st.multiselect("불편하신 증상을 모두 선택하세요", sorted(list(all_symptoms)))
+            selected_symptoms = st.multiselect("불편하신 증상을 모두 선택하세요", engine.symptoms)
         with col2:
             st.markdown("#### 2. 건강 목표 (Goals)")
-            all_purposes = set()
-            for info in PRODUCT_DB.values():
-                all_purposes.update(info['purposes'])
-            selected_purposes = st.multiselect("원하시는 개선 효과를 선택하세요", sorted(list(all_purposes)))
+            selected_purposes = st.multiselect("원하시는 개선 효과를 선택하세요", engine.purposes)
+        # 목록에서 고른 항목 + 검색으로 찾은 항목 (순서 유지, 중복 제거)
+        found = search.profile_terms(searched)
+        selected_symptoms = list(dict.fromkeys(selected_symptoms + found['symptoms']))
+        selected_purposes = list(dict.fromkeys(selected_purposes + found['purposes']))
     
     st.markdown("<br>", unsafe_allow_html=True)
     
     if st.button("AI 처방전 발급받기 🖨️", key='analyze_btn', use_container_width=True):
-        if not selected_symptoms and not selected_purposes:
+        if not selected_symptoms and not selected_purposes and not gap_intake:
             st.warning("⚠️ 증상 또는 목표를 하나 이상 선택해 주세요.")
         else:
             st.markdown("---")
             st.subheader(f"📋 **{name}**님을 위한 처방 결과")
             
-            recommendations = []
-            warnings = [] 
-            
-            for nutrient, info in PRODUCT_DB.items():
-                match_symptom = set(selected_symptoms) & set(info['symptoms'])
-                match_purpose = set(selected_purposes) & set(info['purposes'])
-                
-                if match_symptom or match_purpose:
-                    risk_factors = set(user_diseases) & set(info['contraindications'])
-                    if risk_factors:
-                        warnings.append({'nutrient': nutrient, 'name': info['name'], 'reason': list(risk_factors), 'msg': info['risk_msg']})
-                    else:
-                        recommendations.append((nutrient, info))
-            
-            if warnings:
-                for warn in warnings:
-                    st.markdown(f"""
-                        <div class="custom-card warning-card">
-                            <h4 style="margin: 0;">🚫 <b>{warn['nutrient']}</b> 복용 주의</h4>
-                            <p style="margin-top: 10px;">
-                                <b>감지된 위험 요인:</b> <span style="font-weight: bold;">{', '.join(warn['reason'])}</span><br>
-                                <br>
-                                <b>닥터 코멘트:</b> {warn['msg']}
-                            </p>
-                        </div>
-                    """, unsafe_allow_html=True)
+            profile = {'symptoms': selected_symptoms, 'purposes': selected_purposes,
+                       'diseases': user_diseases, 'gender': gender_input, 'intake': gap_intake}
+            with perf.section('tab1.recommend', cache=True):
+                recommendations, warnings = prescription_cache().recommend(profile, engine, stat_index)
+            with perf.section('tab1.interactions'):
+                interactions = engine.check_interactions([nutrient for nutrient, _, _ in recommendations])
+            with perf.section('tab1.history_record'):
+                history_store().record(history.prescription_event(
+                    patient, profile, recommendations, warnings, interactions, engine, stat_index,
+                    session=history_session()))
             
             if recommendations:
                 st.success(f"✅ 분석 완료: {len(recommendations)}가지 맞춤 영양제가 처방되었습니다.")
-                for nutrient, info in recommendations:
-                    stat_msg = "분석 데이터 부족"
-                    if not stat_df.empty:
-                        try:
-                            col_gender = stat_df.columns[0] 
-                            col_nutrient = stat_df.columns[1] 
-                            col_sub = stat_df.columns[2]
-                            target_row = stat_df[
-                                (stat_df[col_gender] == gender_input) & 
-                                (stat_df[col_nutrient].str.contains(info.get('stat_keyword', nutrient))) &
-                                (stat_df[col_sub] == '소계')
-                            ]
-                            if not target_row.empty:
-                                val = target_row['평균'].values[0]
-                                stat_msg = f"한국 {gender_input} 평균: {val}"
-                        except: pass
-
-                    st.markdown(f"""
-                        <div class="custom-card prescription-card">
-                            <div style="display: flex; justify-content: space-between; align-items: center;">
-                                <h3 style="margin: 0; font-size: 1.2rem;">💊 {info['name']} <span style="font-size: 0.8em; color: gray;">({nutrient})</span></h3>
-                                <span style="background-color: #c6f6d5; color: #22543d; padding: 5px 10px; border-radius: 15px; font-size: 0.8em; font-weight: bold;">적합도 98%</span>
-                            </div>
-                            <hr style="border: 0; border-top: 1px dashed #cbd5e0; margin: 15px 0;">
-                            <div style="display: flex; flex-wrap: wrap;">
-                                <div style="flex: 2; min-width: 250px; margin-right: 20px;">
-                                    <p><b>🩺 효능/효과:</b> {info['detail']}</p>
-                                    <p><b>📊 데이터 분석:</b> {stat_msg}</p>
-                                </div>
-                                <div style="flex: 1; min-width: 200px; padding: 15px; border-radius: 10px; background-color: #f0fff4;">
-                                    <p style="margin: 0 0 10px 0; color: #2f855a !important; font-weight:bold;">⏰ 섭취 가이드</p>
-                                    <ul style="margin: 0; padding-left: 20px; font-size: 0.9em; color: #2d3748;">
-                                        <li>권장량: {info['dosage_daily']}</li>
-                                        <li>방법: {info['directions']}</li>
-                                    </ul>
-                                </div>
-                            </div>
-                            <div style="margin-top: 15px; text-align: right;">
-                                <a href="{info['link']}" target="_blank" style="text-decoration: none; font-weight: bold; color: #38a169;">🛒 최저가 구매하러 가기 ></a>
-                            </div>
-                        </div>
-                    """, unsafe_allow_html=True)
-            elif not warnings:
+            if recommendations or warnings:
+                # 경고/상호작용/처방 카드를 한 번에 만들어 하나의 요소로 보낸다
+                with perf.section('tab1.render_cards'):
+                    html = render.prescription_result(recommendations, warnings, stat_index, gender_input,
+                                                      interactions)
+                st.markdown(html, unsafe_allow_html=True)
+            else:
                 st.info("💡 선택하신 조건에 맞는 추천 영양제가 없습니다.")
 
+with tab1:
+    questionnaire()
+
 # --- TAB 2 ---
-with tab2:
+LINK_PAGE_SIZE = 50
+
+@st.fragment
+def store_guide():
     st.markdown("### 🏥 약국 및 온라인 구매 안내")
     col1, col2 = st.columns(2)
     with col1:
-         st.markdown("""
-            <div class="custom-card">
-                <h4>🌐 온라인 공식 판매처</h4>
-                <p>품질이 검증된 제품의 온라인 최저가를 확인하세요.</p>
-         """, unsafe_allow_html=True)
-         for nutrient, info in PRODUCT_DB.items():
-             st.markdown(f"- [{info['name']}]({info['link']})")
-         st.markdown("</div>", unsafe_allow_html=True)
-         
+        products = current_engine().catalog
+        pages = render.page_count(len(products), LINK_PAGE_SIZE)
+        page = 1
+        if pages > 1:
+            page = st.number_input("페이지", min_value=1, max_value=pages, value=1, key='link_page')
+        st.markdown(render.link_list(products, page, LINK_PAGE_SIZE), unsafe_allow_html=True)
+
     with col2:
         st.markdown("""
             <div class="custom-card">
@@ -411,22 +405,30 @@ with tab2:
             </div>
         """, unsafe_allow_html=True)
 
+with tab2:
+    store_guide()
+
 # --- TAB 3 ---
-with tab3:
-    st.markdown("### 📊 2023 국민건강영양조사 대시보드")
+@st.fragment
+def dashboard():
+    cube = load_stat_cube()
+    years = cube.years
+    # 통계표가 없거나 비어 있으면 연도 없이 제목만 표시한다
+    period = f"{years[0]}~{years[-1]} " if len(years) > 1 else f"{years[0]} " if years else ""
+    st.markdown(f"### 📊 {period}국민건강영양조사 대시보드")
     
-    if not stat_df.empty:
-        col_gender = stat_df.columns[0]
-        col_nutrient = stat_df.columns[1] 
-        col_sub = stat_df.columns[2]
-        
+    if stat_index:
+        patient = current_patient()
+        target_gender = stat_index.overall_gender(patient['patient_gender'])
+        # 환자와 같은 성별/연령대의 평균 (연령대별 통계가 없으면 같은 성별 전체 연령)
+        peer_gender = patient['patient_gender']
+        band = cube.age_band(patient['patient_age'])
+        peer_index = load_stat_index(age=band) if band else stat_index
+        peer_label = f"{peer_gender}, {band or '전체 연령'}"
+
         try:
-            target_gender = '전체' if '전체' in stat_df[col_gender].values else '남자'
-            energy_row = stat_df[(stat_df[col_gender] == target_gender) & (stat_df[col_nutrient].str.contains('에너지')) & (stat_df[col_sub] == '소계')]
-            vitc_row = stat_df[(stat_df[col_gender] == target_gender) & (stat_df[col_nutrient].str.contains('비타민C')) & (stat_df[col_sub] == '소계')]
-            
-            avg_energy = energy_row['평균'].values[0] if not energy_row.empty else 0
-            avg_vitc = vitc_row['평균'].values[0] if not vitc_row.empty else 0
+            avg_energy = stat_index.mean(target_gender, '에너지', default=0)
+            avg_vitc = stat_index.mean(target_gender, '비타민C', default=0)
             
             st.markdown(f"""
                 <div style="display: flex; gap: 20px; margin-bottom: 30px;">
@@ -443,7 +445,24 @@ with tab3:
                     <div class="custom-card" style="flex: 1; text-align: center; padding: 20px;">
                         <span style="font-size: 2em;">📅</span><br>
                         <span>데이터 기준</span><br>
-                        <strong style="font-size: 1.5em; color: #2c5282;">2023년</strong>
+                        <strong style="font-size: 1.5em; color: #2c5282;">{stat_index.year}년</strong>
+                    </div>
+                </div>
+            """, unsafe_allow_html=True)
+
+            peer_energy = peer_index.mean(peer_gender, '에너지', default=0)
+            peer_vitc = peer_index.mean(peer_gender, '비타민C', default=0)
+            st.markdown(f"""
+                <div style="display: flex; gap: 20px; margin-bottom: 30px;">
+                    <div class="custom-card" style="flex: 1; text-align: center; padding: 20px;">
+                        <span style="font-size: 2em;">👤</span><br>
+                        <span>내 또래 평균 에너지 ({peer_label})</span><br>
+                        <strong style="font-size: 1.5em; color: #d69e2e;">{peer_energy:,.0f} kcal</strong>
+                    </div>
+                    <div class="custom-card" style="flex: 1; text-align: center; padding: 20px;">
+                        <span style="font-size: 2em;">👤</span><br>
+                        <span>내 또래 비타민 C ({peer_label})</span><br>
+                        <strong style="font-size: 1.5em; color: #38a169;">{peer_vitc:.1f} mg</strong>
                     </div>
                 </div>
             """, unsafe_allow_html=True)
@@ -451,60 +470,211 @@ with tab3:
         except Exception as e:
             st.warning("지표 로딩 중")
 
+        chart_backend = st.radio(
+            "차트 렌더링 방식", list(charts.BACKENDS), index=list(charts.BACKENDS).index(charts.DEFAULT_BACKEND),
+            format_func=charts.BACKENDS.get, horizontal=True, key='chart_backend',
+        )
+        use_vega = chart_backend == 'vega'
+
         col_chart1, col_chart2 = st.columns(2)
 
         with col_chart1:
             st.markdown("##### 🥗 3대 영양소 균형")
             try:
-                target_gender = '전체' if '전체' in stat_df[col_gender].values else '남자'
-                carb_row = stat_df[(stat_df[col_gender] == target_gender) & (stat_df[col_nutrient].str.contains('탄수화물')) & (stat_df[col_sub] == '소계')]
-                prot_row = stat_df[(stat_df[col_gender] == target_gender) & (stat_df[col_nutrient].str.contains('단백질')) & (stat_df[col_sub] == '소계')]
-                fat_row = stat_df[(stat_df[col_gender] == target_gender) & (stat_df[col_nutrient].str.contains('지방')) & (stat_df[col_sub] == '소계')]
-                
-                if not carb_row.empty:
-                    carb_val = carb_row['평균'].values[0]
-                    prot_val = prot_row['평균'].values[0]
-                    fat_val = fat_row['평균'].values[0]
-                    
-                    fig1, ax1 = plt.subplots(figsize=(6, 4))
-                    labels = ['탄수화물', '단백질', '지방']
-                    sizes = [carb_val, prot_val, fat_val]
-                    colors = ['#ffadad', '#ffd6a5', '#fdffb6'] 
-                    explode = (0.05, 0.05, 0.05)
-
-                    ax1.pie(sizes, labels=labels, autopct='%1.1f%%', startangle=90, colors=colors, explode=explode)
-                    ax1.axis('equal') 
-                    fig1.patch.set_alpha(0)
-                    st.pyplot(fig1)
+                with perf.section(f'tab3.macro_pie.{chart_backend}', cache=not use_vega):
+                    if use_vega:
+                        sizes = charts.macro_data(stat_index, target_gender)
+                        if sizes:
+                            st.vega_lite_chart(charts.macro_pie_spec(sizes), use_container_width=True)
+                    else:
+                        pie_png = render_macro_pie(stat_index.version, stat_index, target_gender)
+                        if pie_png:
+                            st.image(pie_png, use_container_width=True)
             except: st.write("데이터 없음")
 
         with col_chart2:
             st.markdown("##### 👫 남녀 영양소 섭취 비교")
             try:
-                keywords = {'칼슘': '칼슘', '철': '철', '나트륨': '나트륨', '비타민C': '비타민C'}
-                male_vals, female_vals, valid_labels = [], [], []
-                
-                for label, key in keywords.items():
-                    m_row = stat_df[(stat_df[col_gender] == '남자') & (stat_df[col_nutrient].str.contains(key)) & (stat_df[col_sub] == '소계')]
-                    f_row = stat_df[(stat_df[col_gender] == '여자') & (stat_df[col_nutrient].str.contains(key)) & (stat_df[col_sub] == '소계')]
-                    if not m_row.empty:
-                        male_vals.append(m_row['평균'].values[0])
-                        female_vals.append(f_row['평균'].values[0])
-                        valid_labels.append(label)
-                
-                if valid_labels:
-                    x = np.arange(len(valid_labels))
-                    width = 0.35
-                    fig2, ax2 = plt.subplots(figsize=(6, 4))
-                    rects1 = ax2.bar(x - width/2, male_vals, width, label='남자', color='#a0ced9') 
-                    rects2 = ax2.bar(x + width/2, female_vals, width, label='여자', color='#fmb0c2') 
-                    ax2.set_xticks(x)
-                    ax2.set_xticklabels(valid_labels)
-                    ax2.legend()
-                    fig2.patch.set_alpha(0)
-                    ax2.set_facecolor('none')
-                    st.pyplot(fig2)
+                with perf.section(f'tab3.gender_bar.{chart_backend}', cache=not use_vega):
+                    if use_vega:
+                        records = charts.gender_compare_records(stat_index, charts.GENDER_COMPARE_KEYWORDS.values())
+                        if records:
+                            st.vega_lite_chart(charts.gender_bar_spec(records), use_container_width=True)
+                    else:
+                        bar_png = render_gender_bar(stat_index.version, stat_index)
+                        if bar_png:
+                            st.image(bar_png, use_container_width=True)
             except: st.write("데이터 없음")
 
+        if use_vega:
+            st.markdown("##### 📈 연도별 추이")
+            nutrients = stat_index.nutrients
+            trend_nutrient = st.selectbox(
+                "추이를 볼 영양소", nutrients,
+                index=nutrients.index('에너지') if '에너지' in nutrients else 0, key='trend_nutrient',
+            )
+            groups = {(target_gender, None): f"{target_gender} 평균", (peer_gender, band): peer_label}
+            records = charts.trend_records(cube, trend_nutrient, [(label, g, a) for (g, a), label in groups.items()])
+            if len(years) < 2:
+                st.caption("조사 연도가 하나뿐이라 해당 연도 값만 표시합니다.")
+            if records:
+                title = f"평균 섭취량 ({cube.unit(trend_nutrient)})" if cube.unit(trend_nutrient) else "평균 섭취량"
+                st.vega_lite_chart(charts.trend_line_spec(records, title), use_container_width=True)
+
+            st.markdown("##### 🔎 전체 영양소 남녀 비교")
+            # 통계표에 없는 기본 영양소는 건너뛴다 (default 가 options 에 없으면 위젯이 실패한다)
+            picked = st.multiselect(
+                "비교할 영양소를 선택하세요", stat_index.nutrients,
+                default=[n for n in charts.GENDER_COMPARE_KEYWORDS.values() if n in stat_index.nutrients],
+                key='drilldown_nutrients',
+            )
+            records = charts.gender_compare_records(stat_index, picked)
+            if records:
+                st.vega_lite_chart(charts.gender_bar_spec(records), use_container_width=True)
+
     else:
-        st.warning("데이터 로드 실패")
\ No newline at end of file
+        st.warning(data_error_message())
+
+with tab3:
+    dashboard()
+
+# --- TAB 4 ---
+@st.fragment
+def gap_report():
+    patient = current_patient()
+    gender_input = patient['patient_gender']
+    model = load_gap_model()
+
+    st.markdown("### 🧪 내 영양소 섭취 갭 분석")
+    st.caption(f"하루 섭취량을 입력하면 {gender_input} 평균과 모든 영양소를 한 번에 비교합니다. 비워 둔 영양소는 제외됩니다.")
+
+    gi = model.gender_ids.get(gender_input)
+    if gi is None or not model.nutrients:
+        st.warning(data_error_message())
+        return
+
+    base = pd.DataFrame({
+        '영양소': model.nutrients,
+        '단위': model.units,
+        '평균': model.mean[gi],
+        '내 섭취량': np.full(len(model.nutrients), np.nan),
+    })
+    edited = st.data_editor(
+        base, hide_index=True, use_container_width=True, key=f'intake_editor_{gender_input}',
+        disabled=['영양소', '단위', '평균'],
+        column_config={'평균': st.column_config.NumberColumn(format="%.1f"),
+                       '내 섭취량': st.column_config.NumberColumn(min_value=0.0)},
+    )
+
+    intake = {n: v for n, v in zip(edited['영양소'], edited['내 섭취량']) if pd.notna(v)}
+    if not intake:
+        st.session_state['gap_intake'] = {}
+        st.info("💡 분석할 영양소의 섭취량을 하나 이상 입력해 주세요.")
+        return
+
+    analysis = model.analyze(intake, gender_input).dropna(subset=['intake'])
+    # 조사 표본 수가 없으면 z/백분위는 계산하지 않으므로 (모두 NaN) 차트에서도 뺀다
+    records = analysis.drop(columns=['z', 'percentile']) if analysis['percentile'].isna().all() else analysis
+    st.vega_lite_chart(charts.gap_bar_spec(records.to_dict('records')), use_container_width=True)
+
+    gaps = gap_analysis.largest_gaps(analysis)
+    st.session_state['gap_intake'] = gap_analysis.gap_intake(analysis)
+    if gaps.empty:
+        st.success("✅ 평균보다 크게 부족한 영양소가 없습니다.")
+        return
+
+    summary = ', '.join(f"{n} ({r:+.0%})" for n, r in zip(gaps['nutrient'], gaps['deficit_ratio']))
+    st.warning(f"⚠️ 부족 상위 영양소: {summary}\n\n이 결과는 'AI 처방' 탭의 처방에도 반영됩니다.")
+
+    profile = {'diseases': patient['patient_diseases'], 'gender': gender_input,
+               'intake': st.session_state['gap_intake']}
+    engine = current_engine()
+    recommendations, warnings = prescription_cache().recommend(profile, engine, stat_index)
+    interactions = engine.check_interactions([nutrient for nutrient, _, _ in recommendations])
+    if recommendations or warnings:
+        st.markdown(render.prescription_result(recommendations, warnings, stat_index, gender_input, interactions),
+                    unsafe_allow_html=True)
+
+with tab4:
+    gap_report()
+
+# --- TAB 5 ---
+HISTORY_PAGE_SIZE = 200
+
+@st.fragment
+def history_view():
+    st.markdown("### 🗂️ 처방 기록")
+    st.caption("'AI 처방전 발급' 결과가 자동으로 저장됩니다. 방금 발급한 처방은 잠시 후 표시됩니다.")
+
+    # 다른 환자의 기록(나이, 질환, 처방)이 보이지 않도록, 이름 검색과 전체 조회는 관리자만 쓸 수 있다
+    admin = is_admin()
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        if admin:
+            name = st.text_input("환자 이름 (비우면 전체)", value=current_patient()['patient_name'], key='history_name')
+            name, session = name.strip() or None, None
+        else:
+            name, session = None, history_session()
+            st.caption("이 브라우저에서 발급한 처방만 표시합니다. 주소의 ?sid= 를 유지하면 새로고침해도 보입니다.")
+    with col2:
+        today = datetime.date.today()
+        period = st.date_input("기간", value=(today - datetime.timedelta(days=30), today), key='history_period')
+    # 범위를 고르는 중(시작일만 선택)에는 길이 1 튜플이 온다
+    dates = period if isinstance(period, tuple) else (period,)
+    since, until = (dates[0], dates[-1]) if dates else (None, None)
+
+    events = history_store().query(name=name, since=since, until=until, limit=HISTORY_PAGE_SIZE, session=session)
+    if not events:
+        st.info("💡 조건에 맞는 처방 기록이 없습니다.")
+        return
+
+    st.dataframe(pd.DataFrame({
+        '일시': [e['created_at'] for e in events],
+        '이름': [e['name'] for e in events],
+        '나이': [e['age'] for e in events],
+        '성별': [e['gender'] for e in events],
+        '질환': [', '.join(e['diseases']) for e in events],
+        '증상/목표': [', '.join(e['symptoms'] + e['purposes']) for e in events],
+        '처방 (적합도)': [', '.join(f"{n} ({score}%)" for n, score in e['recommendations']) for e in events],
+        '복용 주의': [', '.join(e['warnings']) for e in events],
+    }), hide_index=True, use_container_width=True)
+    if len(events) == HISTORY_PAGE_SIZE:
+        st.caption(f"최근 {HISTORY_PAGE_SIZE}건만 표시합니다. 기간을 좁혀 보세요.")
+
+with tab5:
+    history_view()
+
+_rerun.stop()
+
+# --- 관리자 성능 패널 ---
+
+@st.fragment
+def perf_panel():
+    with st.expander("⏱️ 성능 패널 (관리자)"):
+        st.button("새로고침", key='perf_refresh')
+        summary = perf.recorder.summary()
+        if summary:
+            st.dataframe(pd.DataFrame(summary), hide_index=True, use_container_width=True,
+                         column_config={
+                             'p50_ms': st.column_config.NumberColumn(format="%.2f"),
+                             'p95_ms': st.column_config.NumberColumn(format="%.2f"),
+                             'max_ms': st.column_config.NumberColumn(format="%.2f"),
+                             'hit_rate': st.column_config.NumberColumn(format="%.2f"),
+                         })
+        st.caption(f"처방 캐시: {prescription_cache().stats()}")
+        watcher, engine = catalog_watcher(), current_engine()
+        st.caption(f"카탈로그: 버전 {engine.version}, 제품 {len(engine)}개")
+        if watcher.last_error:
+            st.error(f"products.json 변경이 반영되지 않았습니다 ({watcher.last_error_at}, 이전 버전 사용 중):\n\n"
+                     f"{watcher.last_error}")
+        st.caption(f"처방 기록: {history_store().stats()}")
+        col1, col2 = st.columns(2)
+        with col1:
+            st.download_button("JSON lines", '\n'.join(perf.recorder.jsonl_lines()) + '\n',
+                               file_name='perf.jsonl', mime='application/x-ndjson')
+        with col2:
+            st.download_button("Prometheus", perf.recorder.prometheus_text(),
+                               file_name='metrics.prom', mime='text/plain')
+
+if is_admin():
+    perf_panel()
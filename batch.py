@@ -0,0 +1,183 @@
+"""환자 프로필을 일괄 채점하는 헤드리스 배치 처방 모드.
+
+TAB 1 과 같은 추천/경고 로직(recommender.recommend)을 CSV/JSONL 입력에
+청크 단위로 적용하고, 결과를 한 줄씩 바로 써서 메모리 사용량이 입력
+크기와 무관하게 유지되도록 합니다.
+
+    python batch.py members.csv -o results.jsonl
+    python batch.py members.jsonl -o results.csv --workers 8 --chunksize 20000
+
+입력 컬럼: name, age, gender, diseases, symptoms, purposes
+CSV 에서 diseases/symptoms/purposes 는 ';' 로 구분합니다 (예: "피로;빈혈").
+"""
+import argparse
+import csv
+import json
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import recommender
+import stat_data
+
+LIST_FIELDS = ('diseases', 'symptoms', 'purposes')
+LIST_SEPARATOR = ';'
+CSV_COLUMNS = ['name', 'age', 'gender', 'recommendations', 'scores', 'warnings', 'interactions', 'stat_averages']
+
+_stat_index = None
+# 회원 수에 비해 (성별, 질환, 증상, 목표) 조합은 훨씬 적으므로 프로세스마다 결과를 재사용한다
+_prescriptions = recommender.PrescriptionCache(maxsize=65536, ttl=float('inf'))
+
+
+def _get_stat_index():
+    # 워커 프로세스마다 한 번만 통계표를 읽는다
+    global _stat_index
+    if _stat_index is None:
+        _stat_index = stat_data.StatIndex(stat_data.load_stat_store())
+    return _stat_index
+
+
+# --- 입력 ---
+def _split(value):
+    if value is None:
+        return []
+    if isinstance(value, (list, tuple)):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value).split(LIST_SEPARATOR) if v.strip()]
+
+
+def _normalize(record):
+    patient = {
+        'name': record.get('name', ''),
+        'age': record.get('age'),
+        'gender': record.get('gender') or '남자',
+    }
+    for field in LIST_FIELDS:
+        patient[field] = _split(record.get(field))
+    return patient
+
+
+def read_profiles(path):
+    """CSV 또는 JSONL 파일에서 환자 프로필을 한 건씩 읽습니다."""
+    with open(path, encoding='utf-8-sig', newline='') as f:
+        if path.endswith('.jsonl') or path.endswith('.json'):
+            for line in f:
+                if line.strip():
+                    yield _normalize(json.loads(line))
+        else:
+            for row in csv.DictReader(f):
+                yield _normalize(row)
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# --- 채점 ---
+def score_profile(patient, engine=None, stat_index=None, top_k=recommender.DEFAULT_TOP_K):
+    """TAB 1 처방 버튼과 같은 결과를 dict 로 반환합니다."""
+    if stat_index is None:
+        stat_index = _get_stat_index()
+
+    if engine is None:
+        engine = recommender.default_engine()
+    recommendations, warnings = _prescriptions.recommend(patient, engine, stat_index, top_k)
+    interactions = engine.check_interactions([nutrient for nutrient, _, _ in recommendations])
+
+    stat_averages = {}
+    for nutrient, product, _ in recommendations:
+        val = stat_index.mean(patient['gender'], product.stat_keyword)
+        if val is not None:
+            stat_averages[nutrient] = float(val)
+
+    return {
+        'name': patient['name'],
+        'age': patient['age'],
+        'gender': patient['gender'],
+        'recommendations': [nutrient for nutrient, _, _ in recommendations],
+        'scores': {nutrient: score for nutrient, _, score in recommendations},
+        'warnings': [{'nutrient': w['nutrient'], 'reason': w['reason']} for w in warnings],
+        'interactions': [{'nutrients': [i['a'], i['b']], 'kind': i['kind'], 'separate_hours': i['separate_hours']}
+                         for i in interactions],
+        'stat_averages': stat_averages,
+    }
+
+
+def score_chunk(chunk, top_k=recommender.DEFAULT_TOP_K):
+    return [score_profile(patient, top_k=top_k) for patient in chunk]
+
+
+def score_stream(profiles, chunksize=10000, workers=1, top_k=recommender.DEFAULT_TOP_K):
+    """청크 단위로 채점한 결과를 입력 순서대로 내보냅니다.
+
+    workers > 1 이면 프로세스 풀에 청크를 나눠 주되, 동시에 처리 중인
+    청크 수를 workers * 2 로 묶어 두어 메모리 사용량이 입력 크기에
+    비례해 늘지 않게 합니다.
+    """
+    chunks = chunked(profiles, chunksize)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from score_chunk(chunk, top_k)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        inflight = deque()
+        for chunk in chunks:
+            inflight.append(pool.submit(score_chunk, chunk, top_k))
+            if len(inflight) >= workers * 2:
+                yield from inflight.popleft().result()
+        while inflight:
+            yield from inflight.popleft().result()
+
+
+# --- 출력 ---
+def write_results(results, path):
+    """결과를 한 건씩 바로 기록합니다 (.csv 이면 CSV, 그 외에는 JSONL)."""
+    count = 0
+    out = sys.stdout if path == '-' else open(path, 'w', encoding='utf-8', newline='')
+    try:
+        if path.endswith('.csv'):
+            writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            for result in results:
+                row = dict(result)
+                row['recommendations'] = LIST_SEPARATOR.join(result['recommendations'])
+                row['scores'] = json.dumps(result['scores'], ensure_ascii=False)
+                row['warnings'] = json.dumps(result['warnings'], ensure_ascii=False)
+                row['interactions'] = json.dumps(result['interactions'], ensure_ascii=False)
+                row['stat_averages'] = json.dumps(result['stat_averages'], ensure_ascii=False)
+                writer.writerow(row)
+                count += 1
+        else:
+            for result in results:
+                out.write(json.dumps(result, ensure_ascii=False) + '\n')
+                count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return count
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='환자 프로필 일괄 처방 (headless)')
+    parser.add_argument('input', help='환자 프로필 CSV 또는 JSONL')
+    parser.add_argument('-o', '--output', default='-', help='결과 파일 (.csv 또는 .jsonl, 기본: stdout)')
+    parser.add_argument('--chunksize', type=int, default=10000, help='한 번에 처리할 프로필 수')
+    parser.add_argument('--workers', type=int, default=1, help='프로세스 풀 크기 (1 이면 단일 프로세스)')
+    parser.add_argument('--top-k', type=int, default=recommender.DEFAULT_TOP_K, help='환자당 추천 개수 (0 이면 제한 없음)')
+    args = parser.parse_args(argv)
+
+    results = score_stream(read_profiles(args.input), chunksize=args.chunksize, workers=args.workers,
+                           top_k=args.top_k or None)
+    count = write_results(results, args.output)
+    print(f'{count}명 처방 완료', file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
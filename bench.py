@@ -0,0 +1,435 @@
+"""AppTest 로 app.py 를 headless 실행하는 rerun 벤치마크 / 부하 테스트.
+
+    python bench.py                                  # demo, small 규모
+    python bench.py --scales demo,medium,large --repeat 5
+    python bench.py --sessions 32 --threads 8        # 동시 세션 부하 테스트 추가
+    python bench.py --compare bench_results/이전결과.json
+
+규모마다 합성 카탈로그(products.json)와 통계표(supplements.csv)를 임시 폴더에
+만들고 그 폴더를 작업 디렉터리로 앱을 실행합니다. 측정 항목은 콜드 스타트
+(스냅샷 유무), 재실행, TAB 1 처방 클릭(증상/질환 수별), TAB 3 차트 전환이며,
+각 항목에는 perf 계측 구간별 p50/p95 도 함께 담깁니다. 결과는 커밋 해시와
+함께 bench_results/ 에 JSON 으로 저장되어 커밋 간 비교(--compare)에 씁니다.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+import catalog
+import history
+import perf
+import stat_data
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+APP_PATH = os.path.join(ROOT, 'app.py')
+RESULTS_DIR = os.path.join(ROOT, 'bench_results')
+APP_TIMEOUT = 600
+
+# 규모 이름 -> (제품 수, 통계표 long-format 행 수). demo 는 저장소의 실제 파일.
+SCALES = {
+    'demo': None,
+    'small': (100, 10_000),
+    'medium': (1_000, 100_000),
+    'large': (10_000, 1_000_000),
+}
+# TAB 1 처방 클릭 조합 (증상 수, 질환 수)
+CLICK_CASES = [(1, 0), (3, 1), (5, 3), (10, 5)]
+# 합성 통계표의 연도/연령대 축
+SYNTH_YEARS = [str(y) for y in range(2014, 2024)]
+SYNTH_AGES = ['전체', '1-2세', '3-5세', '6-11세', '12-18세', '19-29세', '30-49세', '50-64세', '65-74세', '75세이상']
+
+
+# --- 합성 데이터 ---
+def synthetic_catalog(n_products, seed=0):
+    """실제 제품을 본떠 n_products 개로 늘린 카탈로그 dict (상호작용 표는 그대로)."""
+    with open(os.path.join(ROOT, catalog.CATALOG_PATH), encoding='utf-8') as f:
+        base = json.load(f)
+    rng = random.Random(seed)
+    products = base['products']
+    symptoms = sorted({s for p in products for s in p['symptoms']})
+    purposes = sorted({s for p in products for s in p['purposes']})
+    diseases = sorted({s for p in products for s in p['contraindications']})
+    symptoms += [f'합성증상{i:04d}' for i in range(n_products // 20)]
+    purposes += [f'합성목표{i:04d}' for i in range(n_products // 40)]
+
+    items = list(products)
+    for i in range(len(products), n_products):
+        template = products[i % len(products)]
+        items.append(dict(
+            template,
+            key=f'P{i:05d}',
+            name=f"{template['name']} #{i}",
+            symptoms=rng.sample(symptoms, 3),
+            purposes=rng.sample(purposes, 2),
+            contraindications=rng.sample(diseases, rng.randint(0, 2)),
+            stat_keyword=template.get('stat_keyword', template['key']),
+        ))
+    return {'products': items[:n_products], 'interactions': base.get('interactions', [])}
+
+
+def write_synthetic_stats(path, n_rows, seed=0):
+    """실제 통계표를 연도 x 연령대 x 가상 영양소로 늘려 약 n_rows 행(long-format)의 KOSIS 형식 CSV 를 씁니다."""
+    rng = np.random.default_rng(seed)
+    base = stat_data.load_stat_data(os.path.join(ROOT, stat_data.STAT_PATH), use_snapshot=False)
+    template = base[['성별(1)', '영양소별(1)', '영양소별(2)', '평균', '표준오차']].astype(
+        {'성별(1)': str, '영양소별(1)': str, '영양소별(2)': str})
+
+    # 연도 x 연령대 한 칸에 들어갈 행 수를 맞추도록 가상 영양소(소계 행, 성별마다)를 더한다
+    per_stratum = n_rows / (len(SYNTH_YEARS) * len(SYNTH_AGES))
+    genders = list(dict.fromkeys(template['성별(1)']))
+    extra = max(0, int(np.ceil((per_stratum - len(template)) / len(genders))))
+    if extra:
+        synth = pd.DataFrame({
+            '성별(1)': np.repeat(genders, extra),
+            '영양소별(1)': [f'합성영양소{i:04d} (mg)' for i in range(extra)] * len(genders),
+            '영양소별(2)': stat_data.SUBTOTAL,
+            '평균': np.tile(rng.uniform(1, 500, extra), len(genders)),
+            '표준오차': np.tile(rng.uniform(0.1, 5, extra), len(genders)),
+        })
+        template = pd.concat([template, synth], ignore_index=True)
+
+    wide = pd.concat([template.assign(**{'연령별(1)': age}) for age in SYNTH_AGES], ignore_index=True)
+    ids = wide[['성별(1)', '연령별(1)', '영양소별(1)', '영양소별(2)']]
+    columns = {}
+    for j, year in enumerate(SYNTH_YEARS):
+        trend = 1 + 0.01 * (j - len(SYNTH_YEARS) / 2)
+        noise = rng.normal(1, 0.02, len(wide))
+        columns[(year, 'mean')] = (wide['평균'].to_numpy() * trend * noise).round(1)
+        columns[(year, 'se')] = wide['표준오차'].to_numpy().round(1)
+    values = pd.DataFrame(columns)
+    values = values.astype(object).where(values.notna(), '-')
+
+    header0 = list(ids.columns) + [year for year in SYNTH_YEARS for _ in range(2)]
+    header1 = list(ids.columns) + ['평균', '표준오차'] * len(SYNTH_YEARS)
+    table = pd.concat([ids.reset_index(drop=True), values], axis=1)
+    table.columns = range(table.shape[1])
+    table = pd.concat([pd.DataFrame([header0, header1]), table], ignore_index=True)
+    table.to_csv(path, header=False, index=False, encoding='cp949')
+    return len(wide) * len(SYNTH_YEARS)
+
+
+def prepare_scale(name, workdir, seed=0):
+    """workdir 에 규모별 products.json / supplements.csv 를 만들고 (제품 수, 통계 행 수) 를 반환합니다."""
+    os.makedirs(workdir, exist_ok=True)
+    if SCALES[name] is None:
+        shutil.copy(os.path.join(ROOT, catalog.CATALOG_PATH), workdir)
+        shutil.copy(os.path.join(ROOT, stat_data.STAT_PATH), workdir)
+        n_products = len(catalog.load_catalog(os.path.join(workdir, catalog.CATALOG_PATH)))
+        n_rows = len(stat_data.load_stat_data(os.path.join(workdir, stat_data.STAT_PATH), use_snapshot=False))
+        return n_products, n_rows
+
+    n_products, n_rows = SCALES[name]
+    with open(os.path.join(workdir, catalog.CATALOG_PATH), 'w', encoding='utf-8') as f:
+        json.dump(synthetic_catalog(n_products, seed), f, ensure_ascii=False)
+    n_rows = write_synthetic_stats(os.path.join(workdir, stat_data.STAT_PATH), n_rows, seed)
+    return n_products, n_rows
+
+
+# --- 측정 도구 ---
+@contextmanager
+def working_dir(path):
+    old = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(old)
+
+
+def peak_rss_mb():
+    """프로세스 최대 상주 메모리 (MB). resource 모듈이 없으면 None."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def latency_stats(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {
+        'n': len(ms),
+        'p50_ms': float(np.percentile(ms, 50)),
+        'p95_ms': float(np.percentile(ms, 95)),
+        'p99_ms': float(np.percentile(ms, 99)),
+        'max_ms': float(ms.max()),
+        'mean_ms': float(ms.mean()),
+    }
+
+
+def clear_caches():
+    # 캐시에서 빠지는 HistoryStore 의 writer 스레드와 SQLite 연결을 먼저 닫는다
+    history.close_all()
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def new_app():
+    return AppTest.from_file(APP_PATH, default_timeout=APP_TIMEOUT)
+
+
+def checked(at):
+    if at.exception:
+        raise RuntimeError(f"앱 실행 중 예외: {at.exception}")
+    return at
+
+
+def timed_run(at):
+    start = time.perf_counter()
+    checked(at.run())
+    return time.perf_counter() - start
+
+
+def symptom_select(at):
+    return next(m for m in at.multiselect if m.label.startswith('불편하신'))
+
+
+class Case:
+    """한 측정 항목의 지연 시간 표본과 그 측정 동안의 perf 구간 요약을 모읍니다.
+
+    measure() 로 잰 rerun 의 perf 표본만 이 Case 전용 recorder 에 모이므로,
+    여러 항목을 번갈아 재도 구간 요약이 섞이지 않습니다.
+    """
+
+    def __init__(self):
+        self.samples = []
+        self.recorder = perf.Recorder()
+
+    def measure(self, at):
+        previous, perf.recorder = perf.recorder, self.recorder
+        try:
+            seconds = timed_run(at)
+        finally:
+            perf.recorder = previous
+        self.samples.append(seconds)
+        return seconds
+
+    def result(self):
+        result = latency_stats(self.samples)
+        result['sections'] = {row['section']: {'p50_ms': row['p50_ms'], 'p95_ms': row['p95_ms'], 'count': row['count']}
+                              for row in self.recorder.summary()}
+        return result
+
+
+# --- 시나리오 ---
+def bench_cold_start(repeat, keep_snapshot):
+    case = Case()
+    for _ in range(repeat):
+        clear_caches()
+        if not keep_snapshot:
+            shutil.rmtree(stat_data.SNAPSHOT_DIR, ignore_errors=True)
+        case.measure(new_app())
+    return case.result()
+
+
+def bench_rerun(at, repeat):
+    case = Case()
+    for _ in range(repeat):
+        case.measure(at)
+    return case.result()
+
+
+def bench_click(at, repeat, n_symptoms, n_diseases, rng):
+    """증상/질환을 무작위로 고른 뒤 처방 버튼 클릭 rerun 만 잽니다."""
+    diseases = at.multiselect(key='patient_diseases')
+    options = [d for d in diseases.options if d != '없음']
+    checked(diseases.set_value(rng.sample(options, min(n_diseases, len(options)))).run())
+
+    case = Case()
+    for _ in range(repeat):
+        symptoms = symptom_select(at)
+        checked(symptoms.set_value(rng.sample(symptoms.options, min(n_symptoms, len(symptoms.options)))).run())
+        at.button(key='analyze_btn').click()
+        case.measure(at)
+    return case.result()
+
+
+def bench_dashboard(at, repeat):
+    """TAB 3 차트 방식을 번갈아 바꾸며 방식별 rerun 시간을 잽니다."""
+    results = {}
+    cases = {backend: Case() for backend in ('vega', 'matplotlib')}
+    for _ in range(repeat):
+        for backend, case in cases.items():
+            at.radio(key='chart_backend').set_value(backend)
+            case.measure(at)
+    for backend, case in cases.items():
+        results[f'tab3_{backend}'] = case.result()
+    return results
+
+
+def bench_scale(name, workdir, repeat, seed):
+    rng = random.Random(seed)
+    n_products, n_rows = prepare_scale(name, workdir, seed)
+    print(f'[{name}] 제품 {n_products:,}개 / 통계 {n_rows:,}행', file=sys.stderr)
+
+    cases = {}
+    with working_dir(workdir):
+        cases['cold_start'] = bench_cold_start(repeat, keep_snapshot=False)
+        cases['cold_start_snapshot'] = bench_cold_start(repeat, keep_snapshot=True)
+        at = checked(new_app().run())
+        cases['rerun'] = bench_rerun(at, repeat)
+        for n_symptoms, n_diseases in CLICK_CASES:
+            cases[f'tab1_click_s{n_symptoms}_d{n_diseases}'] = bench_click(at, repeat, n_symptoms, n_diseases, rng)
+        cases.update(bench_dashboard(at, repeat))
+
+    for case, stats in cases.items():
+        print(f'  {case:<28} p50 {stats["p50_ms"]:9.1f} ms   p95 {stats["p95_ms"]:9.1f} ms', file=sys.stderr)
+    return {'products': n_products, 'rows': n_rows, 'cases': cases}
+
+
+def simulated_session(seed):
+    """한 사용자의 흐름 (접속 -> 증상 선택 -> 처방 -> 대시보드 전환) 의 rerun 시간 목록."""
+    rng = random.Random(seed)
+    at = new_app()
+    latencies = [timed_run(at)]
+    symptoms = symptom_select(at)
+    symptoms.set_value(rng.sample(symptoms.options, min(3, len(symptoms.options))))
+    latencies.append(timed_run(at))
+    at.button(key='analyze_btn').click()
+    latencies.append(timed_run(at))
+    at.radio(key='chart_backend').set_value('matplotlib')
+    latencies.append(timed_run(at))
+    return latencies
+
+
+def bench_concurrent(name, workdir, sessions, threads, seed):
+    """threads 개 스레드에서 sessions 개 세션을 동시에 돌려 rerun 지연 분포와 최대 메모리를 잽니다."""
+    prepare_scale(name, workdir, seed)
+    with working_dir(workdir):
+        clear_caches()
+        checked(new_app().run())  # 서버가 이미 떠 있는 상태 (공유 캐시 적재 완료) 에서 시작
+        rss_before = peak_rss_mb()
+        perf.recorder.reset()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            runs = list(pool.map(simulated_session, range(seed, seed + sessions)))
+        elapsed = time.perf_counter() - start
+
+    latencies = [s for run in runs for s in run]
+    result = latency_stats(latencies)
+    result.update({
+        'scale': name,
+        'sessions': sessions,
+        'threads': threads,
+        'wall_s': elapsed,
+        'reruns_per_s': len(latencies) / elapsed,
+        'peak_rss_mb_before': rss_before,
+        'peak_rss_mb': peak_rss_mb(),
+    })
+    print(f'[concurrent {name}] {sessions}세션 x {threads}스레드: p50 {result["p50_ms"]:.1f} ms, '
+          f'p95 {result["p95_ms"]:.1f} ms, 최대 RSS {result["peak_rss_mb"]} MB', file=sys.stderr)
+    return result
+
+
+# --- 결과 저장 / 비교 ---
+def git_commit():
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def save_results(results, output=None):
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}_{results['meta']['commit'] or 'nocommit'}.json")
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    return output
+
+
+def compare(baseline, current, threshold):
+    """규모/항목별 p50 변화를 출력하고, threshold 비율 이상 느려진 항목 목록을 반환합니다."""
+    regressions = []
+    print(f"\n비교 기준: {baseline['meta'].get('commit')} -> {current['meta'].get('commit')}", file=sys.stderr)
+    for scale, data in current['scales'].items():
+        old_cases = baseline.get('scales', {}).get(scale, {}).get('cases', {})
+        for case, stats in data['cases'].items():
+            old = old_cases.get(case)
+            if not old:
+                continue
+            change = stats['p50_ms'] / old['p50_ms'] - 1 if old['p50_ms'] else 0.0
+            flag = ' <- 느려짐' if change > threshold else ''
+            print(f'  [{scale}] {case:<28} {old["p50_ms"]:9.1f} -> {stats["p50_ms"]:9.1f} ms ({change:+.0%}){flag}',
+                  file=sys.stderr)
+            if flag:
+                regressions.append((scale, case, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='AppTest 기반 rerun 벤치마크 / 부하 테스트')
+    parser.add_argument('--scales', default='demo,small', help=f'쉼표로 구분한 규모 ({", ".join(SCALES)})')
+    parser.add_argument('--repeat', type=int, default=3, help='항목별 반복 횟수')
+    parser.add_argument('--sessions', type=int, default=0, help='동시 세션 수 (0 이면 부하 테스트 생략)')
+    parser.add_argument('--threads', type=int, default=8, help='동시 세션을 돌릴 스레드 수')
+    parser.add_argument('--concurrent-scale', default='demo', help='부하 테스트에 쓸 규모')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help='결과 JSON 경로 (기본: 저장소의 bench_results/<시각>_<커밋>.json)')
+    parser.add_argument('--compare', help='비교할 이전 결과 JSON')
+    parser.add_argument('--fail-threshold', type=float, default=0.2,
+                        help='--compare 시 p50 이 이 비율 이상 느려지면 종료 코드 1')
+    args = parser.parse_args(argv)
+    # AppTest 실행마다 찍히는 streamlit 경고 로그는 측정과 무관하므로 끈다
+    logging.disable(logging.WARNING)
+
+    scales = [s.strip() for s in args.scales.split(',') if s.strip()]
+    unknown = [s for s in scales + [args.concurrent_scale] if s not in SCALES]
+    if unknown:
+        parser.error(f'알 수 없는 규모: {unknown}')
+
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'streamlit': st.__version__,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'scales': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='health-bench-') as tmp:
+        for scale in scales:
+            results['scales'][scale] = bench_scale(scale, os.path.join(tmp, scale), args.repeat, args.seed)
+        if args.sessions:
+            results['concurrent'] = bench_concurrent(args.concurrent_scale,
+                                                     os.path.join(tmp, f'{args.concurrent_scale}-concurrent'),
+                                                     args.sessions, args.threads, args.seed)
+        clear_caches()
+    results['meta']['peak_rss_mb'] = peak_rss_mb()
+
+    path = save_results(results, args.output)
+    print(f'결과 저장: {path}', file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.fail_threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
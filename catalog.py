@@ -0,0 +1,283 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+# --- [DB] 영양제 카탈로그 ---
+# 제품 정보는 products.json 에서 읽는다. 파일을 고치면 서버 재시작 없이 다음 조회 때 반영된다.
+CATALOG_PATH = 'products.json'
+
+# 필드 이름 -> 타입 (list 는 문자열 목록). stat_keyword 가 없으면 key 를 쓴다.
+PRODUCT_SCHEMA = {
+    'key': str,
+    'name': str,
+    'desc': str,
+    'detail': str,
+    'link': str,
+    'symptoms': list,
+    'purposes': list,
+    'dosage_daily': str,
+    'directions': str,
+    'contraindications': list,
+    'risk_msg': str,
+}
+OPTIONAL_FIELDS = {'stat_keyword': str}
+
+# 영양소 상호작용 표 ('interactions' 목록). nutrients 는 제품의 stat_keyword 두 개.
+INTERACTION_SCHEMA = {
+    'nutrients': list,
+    'kind': str,
+    'msg': str,
+}
+INTERACTION_OPTIONAL = {'separate_hours': int}
+# conflict: 함께 먹으면 흡수 방해 등 주의, synergy: 함께 먹으면 좋은 조합
+INTERACTION_KINDS = ('conflict', 'synergy')
+
+
+class CatalogError(ValueError):
+    pass
+
+
+@dataclass(frozen=True, slots=True)
+class Product:
+    key: str
+    name: str
+    desc: str
+    detail: str
+    link: str
+    symptoms: tuple
+    purposes: tuple
+    dosage_daily: str
+    directions: str
+    contraindications: tuple
+    risk_msg: str
+    stat_keyword: str
+
+
+@dataclass(frozen=True, slots=True)
+class Interaction:
+    nutrients: tuple
+    kind: str
+    msg: str
+    separate_hours: int
+
+
+class Catalog:
+    """검증을 마친 불변 제품 목록. products 는 key -> Product (파일 순서 유지).
+
+    interactions 는 영양소 쌍의 상호작용 목록 (Interaction 튜플),
+    synonyms 는 증상/목적 -> 동의어 튜플 dict.
+    """
+
+    __slots__ = ('products', 'interactions', 'synonyms', 'version', 'path')
+
+    def __init__(self, products, version, path=None, interactions=(), synonyms=None):
+        self.products = products
+        self.interactions = interactions
+        self.synonyms = synonyms or {}
+        self.version = version
+        self.path = path
+
+    def __len__(self):
+        return len(self.products)
+
+    def __iter__(self):
+        return iter(self.products.values())
+
+
+def _validate(index, item, schema=PRODUCT_SCHEMA, optional=OPTIONAL_FIELDS, what='제품'):
+    if not isinstance(item, dict):
+        return [f"#{index}: {what} 항목은 객체여야 합니다"]
+    errors = []
+    for field, kind in {**schema, **optional}.items():
+        if field not in item:
+            if field in schema:
+                errors.append(f"#{index}: '{field}' 필드가 없습니다")
+            continue
+        value = item[field]
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            errors.append(f"#{index}: '{field}' 는 {kind.__name__} 이어야 합니다")
+        elif kind is list and not all(isinstance(v, str) for v in value):
+            errors.append(f"#{index}: '{field}' 는 문자열 목록이어야 합니다")
+    unknown = set(item) - set(schema) - set(optional)
+    if unknown:
+        errors.append(f"#{index}: 알 수 없는 필드 {sorted(unknown)}")
+    return errors
+
+
+def _validate_interaction(index, item, nutrients):
+    errors = _validate(index, item, INTERACTION_SCHEMA, INTERACTION_OPTIONAL, '상호작용')
+    if errors:
+        return errors
+    pair = item['nutrients']
+    if len(pair) != 2 or pair[0] == pair[1]:
+        errors.append(f"상호작용 #{index}: 'nutrients' 는 서로 다른 영양소 두 개여야 합니다")
+    errors.extend(f"상호작용 #{index}: 카탈로그에 없는 영양소 '{n}'" for n in pair if n not in nutrients)
+    if item['kind'] not in INTERACTION_KINDS:
+        errors.append(f"상호작용 #{index}: 'kind' 는 {INTERACTION_KINDS} 중 하나여야 합니다")
+    if item.get('separate_hours', 0) < 0:
+        errors.append(f"상호작용 #{index}: 'separate_hours' 는 0 이상이어야 합니다")
+    return errors
+
+
+# 증상/목적 동의어 표 ('synonyms' 객체): 카탈로그의 증상/목적 -> 일상 표현 목록.
+# 자유 입력 증상 검색(search.py)이 이 표현들도 색인한다.
+def _validate_synonyms(raw, terms):
+    if not isinstance(raw, dict):
+        return ["'synonyms' 는 객체여야 합니다"]
+    errors = []
+    for term, phrases in raw.items():
+        if term not in terms:
+            errors.append(f"동의어 '{term}': 카탈로그에 없는 증상/목적입니다")
+        if not isinstance(phrases, list) or not all(isinstance(p, str) and p.strip() for p in phrases):
+            errors.append(f"동의어 '{term}': 비어 있지 않은 문자열 목록이어야 합니다")
+    return errors
+
+
+def _terms(values):
+    # 여러 제품이 같은 증상/목적 문자열을 공유하므로 intern 해서 한 벌만 둔다
+    return tuple(sys.intern(v.strip()) for v in values)
+
+
+def _compile(item):
+    return Product(
+        key=sys.intern(item['key']),
+        name=item['name'],
+        desc=item['desc'],
+        detail=item['detail'],
+        link=item['link'],
+        symptoms=_terms(item['symptoms']),
+        purposes=_terms(item['purposes']),
+        dosage_daily=item['dosage_daily'],
+        directions=item['directions'],
+        contraindications=_terms(item['contraindications']),
+        risk_msg=item['risk_msg'],
+        stat_keyword=item.get('stat_keyword') or item['key'],
+    )
+
+
+def parse_catalog(raw, path=None):
+    """JSON 바이트를 검증하고 Catalog 로 컴파일합니다. 문제가 있으면 CatalogError."""
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        raise CatalogError(f"카탈로그 JSON 파싱 실패: {e}") from e
+
+    items = data.get('products') if isinstance(data, dict) else None
+    if not isinstance(items, list):
+        raise CatalogError("카탈로그에는 'products' 목록이 있어야 합니다")
+
+    errors = []
+    for index, item in enumerate(items):
+        errors.extend(_validate(index, item))
+    if errors:
+        raise CatalogError("카탈로그 검증 실패:\n" + "\n".join(errors))
+
+    products = {}
+    for item in items:
+        product = _compile(item)
+        if product.key in products:
+            raise CatalogError(f"중복된 제품 key: {product.key}")
+        products[product.key] = product
+
+    raw_interactions = data.get('interactions', [])
+    if not isinstance(raw_interactions, list):
+        raise CatalogError("'interactions' 는 목록이어야 합니다")
+    nutrients = {p.stat_keyword for p in products.values()}
+    for index, item in enumerate(raw_interactions):
+        errors.extend(_validate_interaction(index, item, nutrients))
+    if errors:
+        raise CatalogError("상호작용 표 검증 실패:\n" + "\n".join(errors))
+
+    interactions = tuple(
+        Interaction(
+            nutrients=_terms(item['nutrients']),
+            kind=item['kind'],
+            msg=item['msg'],
+            separate_hours=item.get('separate_hours', 0),
+        )
+        for item in raw_interactions
+    )
+
+    raw_synonyms = data.get('synonyms', {})
+    terms = {t for p in products.values() for t in p.symptoms + p.purposes}
+    errors.extend(_validate_synonyms(raw_synonyms, terms))
+    if errors:
+        raise CatalogError("동의어 표 검증 실패:\n" + "\n".join(errors))
+    synonyms = {sys.intern(term): _terms(phrases) for term, phrases in raw_synonyms.items()}
+
+    version = hashlib.sha1(raw).hexdigest()[:16]
+    return Catalog(products, version, path, interactions, synonyms)
+
+
+def load_catalog(path=CATALOG_PATH):
+    with open(path, 'rb') as f:
+        return parse_catalog(f.read(), path)
+
+
+class CatalogWatcher:
+    """카탈로그 파일을 감시하다가 바뀌면 새로 읽어 원자적으로 교체합니다.
+
+    current() 는 check_interval 초에 한 번만 파일 상태를 확인합니다. 새 파일은
+    검증과 build(catalog) 를 모두 마친 뒤에야 참조가 바뀌므로, 읽는 쪽은 항상
+    완전한 이전 버전이나 새 버전 중 하나만 봅니다. 새 파일이 잘못되었으면
+    이전 버전을 계속 쓰고, 사유를 로그와 last_error (시각은 last_error_at) 에
+    남깁니다. 잘못된 파일은 다시 바뀔 때까지 재검증하지 않습니다.
+    """
+
+    def __init__(self, path=CATALOG_PATH, build=None, check_interval=1.0):
+        self.path = path
+        self.build = build or (lambda catalog: catalog)
+        self.check_interval = check_interval
+        self.last_error = None
+        self.last_error_at = None
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._signature = None
+        self._current = None
+        self._reload()
+        if self._current is None:
+            raise CatalogError(self.last_error)
+
+    def _stat(self):
+        st = os.stat(self.path)
+        return st.st_mtime_ns, st.st_size
+
+    def _reload(self):
+        signature = None
+        try:
+            signature = self._stat()
+            catalog = load_catalog(self.path)
+            built = self.build(catalog)
+        except (OSError, CatalogError) as e:
+            # 같은 잘못된 파일을 check_interval 마다 다시 읽지 않도록 서명은 기억해 둔다
+            self._signature = signature
+            self.last_error = str(e)
+            self.last_error_at = time.strftime('%Y-%m-%d %H:%M:%S')
+            logger.warning("카탈로그 %s 를 반영하지 못했습니다 (이전 버전 유지): %s", self.path, e)
+            return
+        self._signature = signature
+        self._current = built
+        self.last_error = None
+        self.last_error_at = None
+
+    def current(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.check_interval and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = now
+                try:
+                    changed = self._stat() != self._signature
+                except OSError:
+                    changed = False
+                if changed:
+                    self._reload()
+            finally:
+                self._lock.release()
+        return self._current
@@ -0,0 +1,263 @@
+import io
+import math
+import os
+import platform
+from functools import lru_cache
+
+import numpy as np
+
+import perf
+
+# --- TAB 3 대시보드 차트 ---
+# 'vega': 집계 데이터만 브라우저로 보내 Vega-Lite 로 그린다 (기본)
+# 'matplotlib': 서버에서 PNG 로 그려 보낸다 (폴백)
+BACKENDS = {'vega': '인터랙티브 (브라우저)', 'matplotlib': '이미지 (matplotlib)'}
+DEFAULT_BACKEND = 'vega'
+
+MACRO_LABELS = ['탄수화물', '단백질', '지방']
+MACRO_COLORS = ['#ffadad', '#ffd6a5', '#fdffb6']
+GENDER_COMPARE_KEYWORDS = {'칼슘': '칼슘', '철': '철', '나트륨': '나트륨', '비타민C': '비타민C'}
+MALE_COLOR = '#a0ced9'
+FEMALE_COLOR = '#ffb0c2'
+
+
+def macro_data(stat_index, gender):
+    """3대 영양소 평균 [탄수화물, 단백질, 지방], 탄수화물 값이 없으면 None."""
+    if stat_index.mean(gender, '탄수화물') is None:
+        return None
+    return [stat_index.mean(gender, label, default=0) for label in MACRO_LABELS]
+
+
+def gender_compare_data(stat_index, keywords=GENDER_COMPARE_KEYWORDS):
+    """남녀 비교 막대그래프용 (labels, male_vals, female_vals)."""
+    male_vals, female_vals, valid_labels = [], [], []
+    for label, key in keywords.items():
+        m_val = stat_index.mean('남자', key)
+        if m_val is not None:
+            male_vals.append(m_val)
+            female_vals.append(stat_index.mean('여자', key, default=0))
+            valid_labels.append(label)
+    return valid_labels, male_vals, female_vals
+
+
+def gender_compare_records(stat_index, nutrients):
+    """남녀 비교용 long-format 레코드 (Vega-Lite 데이터)."""
+    records = []
+    for nutrient in nutrients:
+        for gender in ('남자', '여자'):
+            mean = stat_index.mean(gender, nutrient)
+            if mean is None:
+                continue
+            se = stat_index.get(gender, nutrient)[1]
+            records.append({
+                'nutrient': nutrient,
+                'unit': stat_index.unit(nutrient),
+                'gender': gender,
+                'mean': float(mean),
+                'se': None if math.isnan(se) else float(se),
+            })
+    return records
+
+
+def trend_records(stat_cube, nutrient, groups):
+    """연도별 추이 long-format 레코드. groups: [(범례 이름, 성별, 연령대), ...]"""
+    records = []
+    for label, gender, age in groups:
+        for year, mean, se in stat_cube.series(gender, nutrient, age):
+            records.append({
+                'year': year,
+                'group': label,
+                'mean': mean,
+                'se': None if math.isnan(se) else se,
+                'unit': stat_cube.unit(nutrient),
+            })
+    return records
+
+
+# --- Vega-Lite (클라이언트 렌더링) ---
+def macro_pie_spec(sizes):
+    values = [{'nutrient': label, 'mean': float(size)} for label, size in zip(MACRO_LABELS, sizes)]
+    return {
+        'data': {'values': values},
+        'transform': [
+            {'joinaggregate': [{'op': 'sum', 'field': 'mean', 'as': 'total'}]},
+            {'calculate': 'datum.mean / datum.total', 'as': 'share'},
+        ],
+        'mark': {'type': 'arc', 'innerRadius': 40, 'stroke': 'white'},
+        'encoding': {
+            'theta': {'field': 'mean', 'type': 'quantitative'},
+            'color': {
+                'field': 'nutrient', 'type': 'nominal', 'title': '영양소',
+                'scale': {'domain': MACRO_LABELS, 'range': MACRO_COLORS},
+            },
+            'tooltip': [
+                {'field': 'nutrient', 'type': 'nominal', 'title': '영양소'},
+                {'field': 'mean', 'type': 'quantitative', 'title': '평균 (g)', 'format': ',.1f'},
+                {'field': 'share', 'type': 'quantitative', 'title': '비율', 'format': '.1%'},
+            ],
+        },
+    }
+
+
+def gender_bar_spec(records):
+    return {
+        'data': {'values': records},
+        'params': [{'name': 'pick', 'select': {'type': 'point', 'fields': ['gender']}, 'bind': 'legend'}],
+        'mark': {'type': 'bar', 'tooltip': True},
+        'encoding': {
+            'x': {'field': 'nutrient', 'type': 'nominal', 'title': None, 'sort': None, 'axis': {'labelAngle': 0}},
+            'xOffset': {'field': 'gender'},
+            'y': {'field': 'mean', 'type': 'quantitative', 'title': '평균 섭취량'},
+            'color': {
+                'field': 'gender', 'type': 'nominal', 'title': '성별',
+                'scale': {'domain': ['남자', '여자'], 'range': [MALE_COLOR, FEMALE_COLOR]},
+            },
+            'opacity': {'condition': {'param': 'pick', 'value': 1}, 'value': 0.3},
+            'tooltip': [
+                {'field': 'nutrient', 'type': 'nominal', 'title': '영양소'},
+                {'field': 'gender', 'type': 'nominal', 'title': '성별'},
+                {'field': 'mean', 'type': 'quantitative', 'title': '평균', 'format': ',.1f'},
+                {'field': 'se', 'type': 'quantitative', 'title': '표준오차', 'format': ',.1f'},
+                {'field': 'unit', 'type': 'nominal', 'title': '단위'},
+            ],
+        },
+    }
+
+
+def trend_line_spec(records, title):
+    return {
+        'data': {'values': records},
+        'mark': {'type': 'line', 'point': True, 'tooltip': True},
+        'encoding': {
+            'x': {'field': 'year', 'type': 'ordinal', 'title': '조사 연도', 'axis': {'labelAngle': 0}},
+            'y': {'field': 'mean', 'type': 'quantitative', 'title': title, 'scale': {'zero': False}},
+            'color': {'field': 'group', 'type': 'nominal', 'title': '집단', 'sort': None},
+            'tooltip': [
+                {'field': 'year', 'type': 'ordinal', 'title': '연도'},
+                {'field': 'group', 'type': 'nominal', 'title': '집단'},
+                {'field': 'mean', 'type': 'quantitative', 'title': '평균', 'format': ',.1f'},
+                {'field': 'se', 'type': 'quantitative', 'title': '표준오차', 'format': ',.1f'},
+                {'field': 'unit', 'type': 'nominal', 'title': '단위'},
+            ],
+        },
+    }
+
+
+def gap_bar_spec(records):
+    """영양소별 평균 대비 섭취 비율 (음수 = 부족). 백분위는 records 에 있을 때만 툴팁에 넣는다."""
+    tooltip = [
+        {'field': 'nutrient', 'type': 'nominal', 'title': '영양소'},
+        {'field': 'intake', 'type': 'quantitative', 'title': '내 섭취량', 'format': ',.1f'},
+        {'field': 'mean', 'type': 'quantitative', 'title': '평균', 'format': ',.1f'},
+        {'field': 'unit', 'type': 'nominal', 'title': '단위'},
+        {'field': 'deficit_ratio', 'type': 'quantitative', 'title': '평균 대비', 'format': '+.0%'},
+    ]
+    if records and 'percentile' in records[0]:
+        tooltip.append({'field': 'percentile', 'type': 'quantitative', 'title': '백분위', 'format': '.0f'})
+    return {
+        'data': {'values': records},
+        'mark': {'type': 'bar', 'tooltip': True},
+        'encoding': {
+            'y': {'field': 'nutrient', 'type': 'nominal', 'title': None, 'sort': {'field': 'deficit_ratio'}},
+            'x': {'field': 'deficit_ratio', 'type': 'quantitative', 'title': '평균 대비 (%)', 'axis': {'format': '%'}},
+            'color': {
+                'condition': {'test': 'datum.deficit_ratio < 0', 'value': '#e53e3e'},
+                'value': '#38a169',
+            },
+            'tooltip': tooltip,
+        },
+    }
+
+
+# --- matplotlib (서버 렌더링) ---
+# matplotlib 은 PNG 를 실제로 그릴 때 처음 import 한다 (vega 만 쓰면 불러오지 않는다)
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'fonts')
+# 설치되어 있으면 우선 쓰는 한글 폰트 (운영체제별 기본 폰트 -> 공통 후보 순)
+SYSTEM_FONTS = {
+    'Windows': ['Malgun Gothic'],
+    'Darwin': ['AppleGothic', 'Apple SD Gothic Neo'],
+}
+COMMON_FONTS = ['NanumGothic', 'Noto Sans CJK KR', 'Noto Sans KR']
+
+_fonts_configured = False
+
+
+@lru_cache(maxsize=None)
+def resolve_font():
+    """그래프에 쓸 한글 폰트 이름 (프로세스당 한 번만 찾는다).
+
+    설치된 후보가 없으면 FONT_DIR 의 번들 폰트를 등록해 씁니다. 번들 폰트도
+    없으면 None (matplotlib 기본 폰트).
+    """
+    from matplotlib import font_manager
+
+    installed = {font.name for font in font_manager.fontManager.ttflist}
+    for name in SYSTEM_FONTS.get(platform.system(), []) + COMMON_FONTS:
+        if name in installed:
+            return name
+
+    bundled = sorted(os.listdir(FONT_DIR)) if os.path.isdir(FONT_DIR) else []
+    for filename in bundled:
+        if filename.lower().endswith(('.ttf', '.otf')):
+            path = os.path.join(FONT_DIR, filename)
+            font_manager.fontManager.addfont(path)
+            return font_manager.FontProperties(fname=path).get_name()
+    return None
+
+
+@perf.timed('charts.configure_fonts')
+def configure_fonts():
+    """그래프 한글 폰트 설정. matplotlib 백엔드를 실제로 쓸 때 한 번만 적용합니다."""
+    global _fonts_configured
+    if _fonts_configured:
+        return
+    import matplotlib
+
+    font = resolve_font()
+    if font:
+        matplotlib.rc('font', family=font)
+    matplotlib.rc('axes', unicode_minus=False)
+    _fonts_configured = True
+
+
+def _new_figure():
+    from matplotlib.figure import Figure
+
+    configure_fonts()
+    return Figure(figsize=(6, 4))
+
+
+def _to_png(fig):
+    # pyplot 을 거치지 않은 Figure 라 전역 figure 레지스트리에 남지 않는다.
+    # 바이트로 뽑은 뒤에는 캔버스까지 비워 참조를 끊는다.
+    buf = io.BytesIO()
+    try:
+        fig.savefig(buf, format='png', bbox_inches='tight', dpi=200)
+    finally:
+        fig.clear()
+    return buf.getvalue()
+
+
+def macro_pie_png(sizes):
+    fig = _new_figure()
+    ax = fig.subplots()
+    ax.pie(sizes, labels=MACRO_LABELS, autopct='%1.1f%%', startangle=90,
+           colors=MACRO_COLORS, explode=(0.05, 0.05, 0.05))
+    ax.axis('equal')
+    fig.patch.set_alpha(0)
+    return _to_png(fig)
+
+
+def gender_bar_png(labels, male_vals, female_vals):
+    x = np.arange(len(labels))
+    width = 0.35
+    fig = _new_figure()
+    ax = fig.subplots()
+    ax.bar(x - width/2, male_vals, width, label='남자', color=MALE_COLOR)
+    ax.bar(x + width/2, female_vals, width, label='여자', color=FEMALE_COLOR)
+    ax.set_xticks(x)
+    ax.set_xticklabels(labels)
+    ax.legend()
+    fig.patch.set_alpha(0)
+    ax.set_facecolor('none')
+    return _to_png(fig)
@@ -0,0 +1,127 @@
+"""개인 영양소 섭취량 갭 분석.
+
+통계표의 모든 영양소(소계 행)를 성별 x 영양소 행렬로 한 번만 펼쳐 두고,
+사용자가 입력한 섭취량 전체를 한 번의 NumPy 연산으로 평균과 비교합니다.
+한 사람(analyze)과 코호트 전체(analyze_many / cohort_report) 모두 같은
+행렬 연산을 씁니다.
+
+주 결과는 평균 대비 부족량(deficit)과 부족 비율(deficit_ratio)입니다.
+통계표의 표준오차(SE)는 '평균'의 오차일 뿐 개인 섭취량의 퍼짐이 아니므로,
+z 점수와 백분위는 조사 표본 수 sample_size 를 줄 때만 SD = SE x sqrt(n) 으로
+환산해 계산하고, 없으면 NaN 으로 둡니다.
+"""
+import numpy as np
+import pandas as pd
+
+# 평균의 이 비율 미만으로 섭취하면 '부족' 으로 보고 추천에 반영한다
+DEFICIT_THRESHOLD = -0.2
+DEFAULT_GAP_COUNT = 5
+
+
+def _normal_cdf(z):
+    # scipy 없이 쓰는 표준정규 누적분포 (Abramowitz & Stegun 7.1.26, 오차 < 1.5e-7)
+    x = np.abs(z) / np.sqrt(2.0)
+    t = 1.0 / (1.0 + 0.3275911 * x)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erf = 1.0 - poly * np.exp(-x * x)
+    return 0.5 * (1.0 + np.sign(z) * erf)
+
+
+class GapModel:
+    """성별 x 영양소 평균/표준오차 행렬. StatIndex 에서 한 번만 만듭니다."""
+
+    def __init__(self, stat_index):
+        self.version = stat_index.version
+        self.genders = list(stat_index.genders)
+        self.nutrients = list(stat_index.nutrients)
+        self.units = [stat_index.unit(n) for n in self.nutrients]
+        self.gender_ids = {g: i for i, g in enumerate(self.genders)}
+        self.nutrient_ids = {n: i for i, n in enumerate(self.nutrients)}
+
+        shape = (len(self.genders), len(self.nutrients))
+        self.mean = np.full(shape, np.nan)
+        self.se = np.full(shape, np.nan)
+        for gi, gender in enumerate(self.genders):
+            for ni, nutrient in enumerate(self.nutrients):
+                entry = stat_index.get(gender, nutrient)
+                if entry is not None:
+                    self.mean[gi, ni], self.se[gi, ni] = entry
+
+    def intake_vector(self, intake):
+        """{영양소: 섭취량} -> 영양소 순서의 배열 (입력 안 한 영양소는 NaN)."""
+        vec = np.full(len(self.nutrients), np.nan)
+        for nutrient, value in intake.items():
+            i = self.nutrient_ids.get(nutrient)
+            if i is not None and value is not None:
+                vec[i] = value
+        return vec
+
+    def analyze_many(self, intakes, genders, sample_size=None):
+        """intakes: (사람 수 x 영양소 수) 배열, genders: 사람별 성별.
+
+        반환값: 같은 모양의 배열 dict
+            deficit: 섭취량 - 평균, deficit_ratio: deficit / 평균,
+            z: 표준 점수, percentile: 0~100 (z/percentile 은 sample_size 가 있을 때만, 없으면 NaN)
+        """
+        intakes = np.asarray(intakes, dtype=float)
+        rows = np.array([self.gender_ids.get(g, -1) for g in genders], dtype=np.intp)
+        known = rows >= 0
+        mean = np.full(intakes.shape, np.nan)
+        se = np.full(intakes.shape, np.nan)
+        mean[known] = self.mean[rows[known]]
+        se[known] = self.se[rows[known]]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            deficit = intakes - mean
+            ratio = deficit / mean
+            if sample_size:
+                spread = se * np.sqrt(sample_size)
+                z = np.where(spread > 0, deficit / spread, np.nan)
+            else:
+                # 평균의 표준오차로 나누면 개인 분포와 무관하게 |z| 가 부풀려진다
+                z = np.full(intakes.shape, np.nan)
+        percentile = 100 * _normal_cdf(z)
+        return {'deficit': deficit, 'deficit_ratio': ratio, 'z': z, 'percentile': percentile}
+
+    def analyze(self, intake, gender, sample_size=None):
+        """한 사람의 섭취량 dict 를 모든 영양소에 대해 분석한 DataFrame."""
+        vec = self.intake_vector(intake)
+        result = self.analyze_many(vec[None, :], [gender], sample_size)
+        gi = self.gender_ids.get(gender)
+        return pd.DataFrame({
+            'nutrient': self.nutrients,
+            'unit': self.units,
+            'intake': vec,
+            'mean': self.mean[gi] if gi is not None else np.nan,
+            'se': self.se[gi] if gi is not None else np.nan,
+            'deficit': result['deficit'][0],
+            'deficit_ratio': result['deficit_ratio'][0],
+            'z': result['z'][0],
+            'percentile': result['percentile'][0],
+        })
+
+    def cohort_report(self, df, gender_col='gender', sample_size=None):
+        """영양소 이름을 열로 가진 코호트 DataFrame 을 한 번에 분석합니다.
+
+        반환값: 열이 (지표, 영양소) MultiIndex 인 DataFrame (행 순서 유지).
+        """
+        cols = [n for n in self.nutrients if n in df.columns]
+        intakes = np.full((len(df), len(self.nutrients)), np.nan)
+        for n in cols:
+            intakes[:, self.nutrient_ids[n]] = pd.to_numeric(df[n], errors='coerce').to_numpy()
+        result = self.analyze_many(intakes, df[gender_col].to_numpy(), sample_size)
+        frames = {name: pd.DataFrame(values, columns=self.nutrients, index=df.index)[cols]
+                  for name, values in result.items()}
+        return pd.concat(frames, axis=1)
+
+
+def largest_gaps(analysis, count=DEFAULT_GAP_COUNT, threshold=DEFICIT_THRESHOLD):
+    """평균 대비 가장 많이 부족한 영양소 행만 (부족한 순서로) 골라냅니다."""
+    short = analysis[analysis['deficit_ratio'] <= threshold]
+    return short.nsmallest(count, 'deficit_ratio')
+
+
+def gap_intake(analysis, count=DEFAULT_GAP_COUNT, threshold=DEFICIT_THRESHOLD):
+    """추천 엔진에 넘길 {영양소: 섭취량} (부족 상위 영양소만)."""
+    gaps = largest_gaps(analysis, count, threshold)
+    return dict(zip(gaps['nutrient'], gaps['intake'].astype(float)))
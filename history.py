@@ -0,0 +1,284 @@
+"""처방 기록 저장소 (SQLite, WAL 모드).
+
+버튼 핸들러는 record() 로 큐에 넣기만 하고 바로 돌아갑니다. 디스크 쓰기는
+백그라운드 writer 스레드 하나가 모아서 트랜잭션 한 번에 처리하고, 조회는
+WAL 덕분에 쓰기와 동시에 연결 풀의 읽기 연결로 처리합니다.
+
+기록마다 브라우저 세션 ID(session)를 남겨, 일반 사용자는 자기 세션의 기록만
+조회하게 합니다 (다른 환자 기록 조회는 관리자만).
+"""
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+HISTORY_PATH = 'history.db'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prescriptions (
+    id INTEGER PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    name TEXT NOT NULL,
+    age INTEGER,
+    gender TEXT,
+    diseases TEXT,
+    symptoms TEXT,
+    purposes TEXT,
+    intake TEXT,
+    recommendations TEXT,
+    warnings TEXT,
+    interactions TEXT,
+    catalog_version TEXT,
+    stat_version TEXT,
+    session TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_prescriptions_name ON prescriptions (name, created_at);
+CREATE INDEX IF NOT EXISTS idx_prescriptions_created ON prescriptions (created_at);
+"""
+# 예전 파일에 없는 열 (시작할 때 ALTER TABLE 로 추가) 과 그 열에 거는 색인
+ADDED_COLUMNS = (('session', 'TEXT'),)
+ADDED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_prescriptions_session ON prescriptions (session, created_at);
+"""
+
+# 컬럼 순서 (INSERT 와 조회 결과 dict 의 키). JSON_FIELDS 는 JSON 문자열로 저장한다.
+COLUMNS = ('created_at', 'name', 'age', 'gender', 'diseases', 'symptoms', 'purposes', 'intake',
+           'recommendations', 'warnings', 'interactions', 'catalog_version', 'stat_version', 'session')
+JSON_FIELDS = ('diseases', 'symptoms', 'purposes', 'intake', 'recommendations', 'warnings', 'interactions')
+
+# 닫히지 않은 저장소들 (프로세스 종료나 캐시 초기화 때 close_all() 로 닫는다)
+_open_stores = set()
+_open_lock = threading.Lock()
+
+_INSERT = f"INSERT INTO prescriptions ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})"
+_STOP = object()
+
+
+def now():
+    return datetime.now().isoformat(sep=' ', timespec='seconds')
+
+
+def prescription_event(patient, profile, recommendations, warnings, interactions, engine, stat_index,
+                       session=None):
+    """처방 버튼 한 번의 결과를 기록용 dict 로 만듭니다. session 은 기록한 브라우저 세션 ID."""
+    return {
+        'created_at': now(),
+        'name': patient['patient_name'],
+        'age': patient['patient_age'],
+        'gender': patient['patient_gender'],
+        'diseases': list(profile.get('diseases', ())),
+        'symptoms': list(profile.get('symptoms', ())),
+        'purposes': list(profile.get('purposes', ())),
+        'intake': dict(profile.get('intake') or {}),
+        'recommendations': [[nutrient, score] for nutrient, _, score in recommendations],
+        'warnings': [w['nutrient'] for w in warnings],
+        'interactions': [[i['a'], i['b'], i['kind']] for i in interactions],
+        'catalog_version': engine.version,
+        'stat_version': getattr(stat_index, 'version', None),
+        'session': session,
+    }
+
+
+def close_all():
+    """열려 있는 모든 HistoryStore 를 닫습니다 (남은 기록은 쓰고 닫는다)."""
+    with _open_lock:
+        stores = list(_open_stores)
+    for store in stores:
+        store.close()
+
+
+atexit.register(close_all)
+
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    conn.execute('PRAGMA busy_timeout = 10000')
+    return conn
+
+
+def _migrate(conn):
+    existing = {row[1] for row in conn.execute('PRAGMA table_info(prescriptions)')}
+    for column, kind in ADDED_COLUMNS:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE prescriptions ADD COLUMN {column} {kind}')
+    conn.executescript(ADDED_INDEXES)
+
+
+def _row(event):
+    return tuple(
+        json.dumps(event.get(col), ensure_ascii=False) if col in JSON_FIELDS else event.get(col)
+        for col in COLUMNS
+    )
+
+
+class HistoryStore:
+    """배치 쓰기 스레드 + 읽기 연결 풀을 가진 처방 기록 저장소.
+
+    record() 는 블로킹하지 않습니다. 큐(max_pending)가 가득 차면 그 기록은
+    버리고 dropped 로 셉니다. writer 는 batch_size 개가 모이거나 flush_interval
+    초가 지나면 executemany 한 번으로 씁니다.
+    """
+
+    def __init__(self, path=HISTORY_PATH, batch_size=200, flush_interval=0.5, pool_size=4, max_pending=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.last_error = None
+
+        # 스키마와 WAL 모드는 시작할 때 한 번 동기적으로 설정한다 (journal_mode 는 파일에 남는다)
+        conn = _connect(path)
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.executescript(SCHEMA)
+            _migrate(conn)
+        finally:
+            conn.close()
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name='history-writer', daemon=True)
+        self._writer.start()
+        with _open_lock:
+            _open_stores.add(self)
+
+    # --- 쓰기 ---
+    def record(self, event):
+        """기록을 쓰기 큐에 넣습니다. 큐에 넣었으면 True."""
+        if self._closed:
+            return False
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self, timeout=None):
+        """지금까지 record() 한 기록이 모두 디스크에 쓰일 때까지 기다립니다."""
+        if self._closed:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        conn.execute('PRAGMA synchronous = NORMAL')
+        try:
+            stop = False
+            while not stop:
+                batch, waiters = [], []
+                item = self._queue.get()
+                # 첫 기록이 들어온 뒤 flush_interval 동안 또는 batch_size 개까지 모은다
+                deadline = time.monotonic() + self.flush_interval
+                while True:
+                    if item is _STOP:
+                        stop = True
+                    elif isinstance(item, threading.Event):
+                        waiters.append(item)
+                    else:
+                        batch.append(item)
+                    remaining = deadline - time.monotonic()
+                    if stop or waiters or len(batch) >= self.batch_size or remaining <= 0:
+                        break
+                    try:
+                        item = self._queue.get(timeout=remaining)
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    self._write(conn, batch)
+                for waiter in waiters:
+                    waiter.set()
+        finally:
+            conn.close()
+
+    def _write(self, conn, batch):
+        try:
+            with conn:
+                conn.executemany(_INSERT, [_row(event) for event in batch])
+            self.written += len(batch)
+            self.batches += 1
+        except sqlite3.Error as e:
+            self.dropped += len(batch)
+            self.last_error = str(e)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        with _open_lock:
+            _open_stores.discard(self)
+        self._queue.put(_STOP)
+        self._writer.join(timeout=10)
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+    # --- 읽기 ---
+    @contextmanager
+    def _reader(self):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = _connect(self.path)
+            conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def query(self, name=None, since=None, until=None, limit=100, session=None):
+        """최근 기록부터 최대 limit 건. name/session 은 정확히 일치, since/until 은 'YYYY-MM-DD' (포함)."""
+        where, params = [], []
+        if session:
+            where.append('session = ?')
+            params.append(session)
+        if name:
+            where.append('name = ?')
+            params.append(name)
+        if since:
+            where.append('created_at >= ?')
+            params.append(str(since))
+        if until:
+            # 'YYYY-MM-DD' 하루 전체를 포함하도록 다음 문자로 상한을 잡는다
+            where.append('created_at < ?')
+            params.append(f'{until}~')
+        sql = 'SELECT id, ' + ', '.join(COLUMNS) + ' FROM prescriptions'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY created_at DESC, id DESC LIMIT ?'
+        params.append(limit)
+
+        with self._reader() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        events = []
+        for row in rows:
+            event = dict(row)
+            for field in JSON_FIELDS:
+                if event[field] is not None:
+                    event[field] = json.loads(event[field])
+            events.append(event)
+        return events
+
+    def stats(self):
+        return {
+            'pending': self._queue.qsize(),
+            'written': self.written,
+            'batches': self.batches,
+            'dropped': self.dropped,
+            'last_error': self.last_error,
+        }
@@ -0,0 +1,190 @@
+"""구간별 실행 시간 계측.
+
+section() 컨텍스트 매니저나 timed() 데코레이터로 감싼 구간마다 벽시계 시간,
+순 메모리 블록 증감(sys.getallocatedblocks), 캐시 적중 여부를 표본으로 남깁니다.
+표본은 프로세스 전체가 공유하는 recorder 에 구간별 최근 WINDOW 개씩 쌓이고,
+summary() 로 p50/p95 를, jsonl_lines() / prometheus_text() 로 내보내기를 합니다.
+환경 변수 PERF_LOG 에 파일 경로를 주면 모든 표본을 JSON lines 로 덧붙여 씁니다.
+"""
+import atexit
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+
+WINDOW = 1000
+LOG_ENV = 'PERF_LOG'
+METRIC_PREFIX = 'health_app'
+
+_local = threading.local()
+
+
+def _cache_stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class Recorder:
+    """구간 이름 -> 최근 표본 (deque) 과 누적 합계. 여러 세션 스레드가 함께 씁니다."""
+
+    def __init__(self, window=WINDOW, log_path=None):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = defaultdict(lambda: deque(maxlen=window))
+        self._totals = defaultdict(lambda: {'count': 0, 'seconds': 0.0, 'hit': 0, 'miss': 0})
+        self._log = open(log_path, 'a', encoding='utf-8') if log_path else None
+        if self._log is not None:
+            atexit.register(self._log.close)
+
+    def add(self, sample):
+        with self._lock:
+            self._samples[sample['section']].append(sample)
+            totals = self._totals[sample['section']]
+            totals['count'] += 1
+            totals['seconds'] += sample['seconds']
+            if sample['cache']:
+                totals[sample['cache']] += 1
+            if self._log is not None:
+                self._log.write(json.dumps(sample, ensure_ascii=False) + '\n')
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+
+    def _snapshot(self):
+        with self._lock:
+            return {name: list(samples) for name, samples in self._samples.items()}, \
+                   {name: dict(totals) for name, totals in self._totals.items()}
+
+    def summary(self):
+        """구간별 요약 [{'section', 'count', 'p50_ms', 'p95_ms', 'max_ms', 'alloc_blocks', 'hit_rate'}].
+
+        시간/메모리는 최근 표본(window) 기준, count 와 hit_rate 는 누적 기준.
+        """
+        samples, totals = self._snapshot()
+        rows = []
+        for name in sorted(samples):
+            ms = np.array([s['seconds'] for s in samples[name]]) * 1000
+            p50, p95 = np.percentile(ms, [50, 95])
+            total = totals[name]
+            lookups = total['hit'] + total['miss']
+            rows.append({
+                'section': name,
+                'count': total['count'],
+                'p50_ms': float(p50),
+                'p95_ms': float(p95),
+                'max_ms': float(ms.max()),
+                'alloc_blocks': int(np.median([s['alloc_blocks'] for s in samples[name]])),
+                'hit_rate': total['hit'] / lookups if lookups else None,
+            })
+        return rows
+
+    def jsonl_lines(self):
+        samples, _ = self._snapshot()
+        for name in sorted(samples):
+            for sample in samples[name]:
+                yield json.dumps(sample, ensure_ascii=False)
+
+    def prometheus_text(self, prefix=METRIC_PREFIX):
+        """Prometheus 텍스트 노출 형식 (summary + 캐시 카운터)."""
+        samples, totals = self._snapshot()
+        lines = [
+            f'# HELP {prefix}_section_seconds Wall time of instrumented sections.',
+            f'# TYPE {prefix}_section_seconds summary',
+        ]
+        for name in sorted(samples):
+            seconds = [s['seconds'] for s in samples[name]]
+            for q in (0.5, 0.95):
+                lines.append(f'{prefix}_section_seconds{{section="{name}",quantile="{q}"}} '
+                             f'{np.quantile(seconds, q):.6f}')
+            lines.append(f'{prefix}_section_seconds_sum{{section="{name}"}} {totals[name]["seconds"]:.6f}')
+            lines.append(f'{prefix}_section_seconds_count{{section="{name}"}} {totals[name]["count"]}')
+
+        lines.append(f'# HELP {prefix}_section_cache_total Cache lookups of instrumented sections.')
+        lines.append(f'# TYPE {prefix}_section_cache_total counter')
+        for name in sorted(totals):
+            if not (totals[name]['hit'] or totals[name]['miss']):
+                continue
+            for result in ('hit', 'miss'):
+                lines.append(f'{prefix}_section_cache_total{{section="{name}",result="{result}"}} '
+                             f'{totals[name][result]}')
+        return '\n'.join(lines) + '\n'
+
+
+recorder = Recorder(log_path=os.environ.get(LOG_ENV))
+
+
+class Section:
+    """with 문이나 start()/stop() 으로 한 구간을 잽니다.
+
+    cache=True 인 구간은 기본값이 '적중' 이고, 구간 안에서 note_miss() 가
+    불리면 '실패' 로 기록됩니다 (캐시된 함수 본문에서 호출).
+    """
+
+    __slots__ = ('name', 'cache', '_start', '_blocks')
+
+    def __init__(self, name, cache=False):
+        self.name = name
+        self.cache = 'hit' if cache else None
+
+    def start(self):
+        if self.cache:
+            _cache_stack().append(self)
+        self._blocks = sys.getallocatedblocks()
+        self._start = time.perf_counter()
+        return self
+
+    def stop(self):
+        elapsed = time.perf_counter() - self._start
+        blocks = sys.getallocatedblocks() - self._blocks
+        if self.cache:
+            stack = _cache_stack()
+            if self in stack:
+                stack.remove(self)
+        recorder.add({
+            'ts': round(time.time(), 3),
+            'section': self.name,
+            'seconds': elapsed,
+            'alloc_blocks': blocks,
+            'cache': self.cache,
+        })
+        return elapsed
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+
+def section(name, cache=False):
+    return Section(name, cache)
+
+
+def timed(name=None, cache=False):
+    """함수 전체를 한 구간으로 재는 데코레이터 (이름을 생략하면 모듈.함수)."""
+    def decorate(func):
+        label = name or f'{func.__module__}.{func.__qualname__}'
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Section(label, cache):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def note_miss():
+    """현재 스레드에서 열려 있는 가장 안쪽 캐시 구간을 '실패' 로 표시합니다."""
+    stack = _cache_stack()
+    if stack:
+        stack[-1].cache = 'miss'
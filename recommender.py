@@ -0,0 +1,348 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import catalog
+import gap_analysis
+import perf
+
+# --- 적합도 점수 가중치 ---
+# 사용자가 채운 항목의 가중치만 합산해 0~100% 로 정규화한다.
+SYMPTOM_WEIGHT = 0.6
+PURPOSE_WEIGHT = 0.4
+GAP_WEIGHT = 0.3
+# 갭 분석이 '부족' 으로 보는 영양소 (평균의 80% 미만 섭취) 는 증상/목표가 없어도
+# 추천 후보가 된다. 기준은 gap_analysis.DEFICIT_THRESHOLD 하나로 관리한다
+GAP_MATCH_MIN = -gap_analysis.DEFICIT_THRESHOLD
+DEFAULT_TOP_K = 5
+
+
+# --- 카탈로그 컴파일 ---
+def _vocabulary(products, field):
+    terms = set()
+    for product in products.values():
+        terms.update(getattr(product, field))
+    return sorted(terms)
+
+
+def _incidence(products, field, vocab_ids):
+    """제품 x 용어 boolean 행렬 (제품 i 가 용어 j 를 가지면 True)."""
+    matrix = np.zeros((len(products), len(vocab_ids)), dtype=bool)
+    for row, product in enumerate(products.values()):
+        cols = [vocab_ids[t] for t in getattr(product, field)]
+        matrix[row, cols] = True
+    return matrix
+
+
+def top_k_indices(scores, candidates, k):
+    """candidates 중 점수 상위 k 개의 행 번호를 (점수 내림차순, 카탈로그 순) 으로 반환.
+
+    partition 으로 k 번째 점수만 찾은 뒤 그보다 높은 행과, 그 점수와 같은 행 중
+    카탈로그 순으로 앞선 행만 남기므로 카탈로그 전체를 정렬하지 않습니다.
+    (argpartition 은 k 번째 자리의 동점 중 아무 행이나 고르므로 쓰지 않는다)
+    """
+    rows = np.flatnonzero(candidates)
+    if k is not None and k <= 0:
+        return rows[:0]
+    if k is not None and len(rows) > k:
+        values = scores[rows]
+        kth = np.partition(-values, k - 1)[k - 1]
+        above = values > -kth
+        tied = np.flatnonzero(values == -kth)[:k - above.sum()]
+        above[tied] = True
+        rows = rows[above]
+    order = np.lexsort((rows, -scores[rows]))
+    return rows[order]
+
+
+class CatalogEngine:
+    """Catalog 를 정수 ID 와 boolean 행렬로 한 번만 컴파일해 두는 추천 엔진.
+
+    증상/목적/질환은 각각 정수 ID 를 받고, 제품은 행렬의 한 행이 됩니다.
+    매칭과 금기 필터링은 선택된 열만 골라 any() 하는 한 번의 벡터 연산이라
+    클릭당 비용이 제품 수만큼의 파이썬 루프로 늘어나지 않습니다.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.version = catalog.version
+        products = self.products = catalog.products
+        self.keys = list(products)
+        self.key_ids = {k: i for i, k in enumerate(self.keys)}
+
+        self.symptoms = _vocabulary(products, 'symptoms')
+        self.purposes = _vocabulary(products, 'purposes')
+        self.diseases = _vocabulary(products, 'contraindications')
+
+        self.symptom_ids = {t: i for i, t in enumerate(self.symptoms)}
+        self.purpose_ids = {t: i for i, t in enumerate(self.purposes)}
+        self.disease_ids = {t: i for i, t in enumerate(self.diseases)}
+
+        self.symptom_matrix = _incidence(products, 'symptoms', self.symptom_ids)
+        self.purpose_matrix = _incidence(products, 'purposes', self.purpose_ids)
+        self.contra_matrix = _incidence(products, 'contraindications', self.disease_ids)
+        self.symptom_counts = self.symptom_matrix.sum(axis=1)
+        self.purpose_counts = self.purpose_matrix.sum(axis=1)
+
+        # 제품별 통계 키 (섭취량 부족분 계산용)
+        self.stat_keys = sorted({p.stat_keyword for p in products.values()})
+        stat_key_ids = {k: i for i, k in enumerate(self.stat_keys)}
+        self.product_stat_ids = np.array([stat_key_ids[p.stat_keyword] for p in products.values()], dtype=np.intp)
+
+        # 영양소 x 영양소 상호작용 행렬 (칸 값 = catalog.interactions 번호, -1 = 없음).
+        # 제품끼리의 상호작용은 product_stat_ids 로 이 행렬의 행/열을 골라 읽는다
+        self.interactions = catalog.interactions
+        self.interaction_matrix = np.full((len(self.stat_keys), len(self.stat_keys)), -1, dtype=np.int32)
+        for i, interaction in enumerate(self.interactions):
+            a, b = (stat_key_ids[n] for n in interaction.nutrients)
+            self.interaction_matrix[a, b] = self.interaction_matrix[b, a] = i
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def _ids(terms, vocab_ids):
+        # 카탈로그에 없는 용어(예: '없음', '당뇨')는 어떤 제품과도 겹치지 않으므로 버린다
+        return np.fromiter((vocab_ids[t] for t in set(terms) if t in vocab_ids), dtype=np.intp)
+
+    def match(self, profile):
+        """(matched, risky, risk_cols, symptom_hits, purpose_hits) 를 한 번에 계산합니다."""
+        symptom_cols = self._ids(profile.get('symptoms', ()), self.symptom_ids)
+        purpose_cols = self._ids(profile.get('purposes', ()), self.purpose_ids)
+        risk_cols = self._ids(profile.get('diseases', ()), self.disease_ids)
+
+        symptom_hits = self.symptom_matrix[:, symptom_cols].sum(axis=1)
+        purpose_hits = self.purpose_matrix[:, purpose_cols].sum(axis=1)
+        matched = (symptom_hits > 0) | (purpose_hits > 0)
+        risky = self.contra_matrix[:, risk_cols].any(axis=1)
+        return matched, risky, risk_cols, symptom_hits, purpose_hits
+
+    def intake_gaps(self, profile, stat_index):
+        """제품별 섭취 부족 비율 (0~1). 평균보다 덜 먹을수록 1 에 가깝습니다.
+
+        profile['intake'] = {통계 키: 하루 섭취량} 이 없으면 None.
+        """
+        intake = profile.get('intake')
+        if not intake or stat_index is None:
+            return None
+        gender = profile.get('gender', '남자')
+        gap_by_key = np.zeros(len(self.stat_keys))
+        for i, key in enumerate(self.stat_keys):
+            value = intake.get(key)
+            avg = stat_index.mean(gender, key)
+            if value is None or not avg:
+                continue
+            gap_by_key[i] = min(max((avg - value) / avg, 0.0), 1.0)
+        return gap_by_key[self.product_stat_ids]
+
+    def score(self, profile, stat_index=None, match=None, gaps=None):
+        """모든 제품의 적합도(0~100) 를 한 번의 벡터 연산으로 계산합니다.
+
+        증상/목적 점수는 '겹친 개수 / 겹칠 수 있는 최대 개수' 이고, 섭취량을
+        입력했다면 평균 대비 부족분을 더합니다.
+        """
+        if match is None:
+            match = self.match(profile)
+        if gaps is None:
+            gaps = self.intake_gaps(profile, stat_index)
+        _, _, _, symptom_hits, purpose_hits = match
+
+        n_symptoms = len(set(profile.get('symptoms', ())))
+        n_purposes = len(set(profile.get('purposes', ())))
+        total = np.zeros(len(self.keys))
+        weight = 0.0
+        if n_symptoms:
+            possible = np.maximum(np.minimum(self.symptom_counts, n_symptoms), 1)
+            total += SYMPTOM_WEIGHT * symptom_hits / possible
+            weight += SYMPTOM_WEIGHT
+        if n_purposes:
+            possible = np.maximum(np.minimum(self.purpose_counts, n_purposes), 1)
+            total += PURPOSE_WEIGHT * purpose_hits / possible
+            weight += PURPOSE_WEIGHT
+        if gaps is not None:
+            total += GAP_WEIGHT * gaps
+            weight += GAP_WEIGHT
+        if not weight:
+            return total
+        return np.rint(100 * total / weight)
+
+    def recommend(self, profile, stat_index=None, top_k=DEFAULT_TOP_K):
+        """profile 의 증상/목적에 맞는 제품을 적합도 순으로 최대 top_k 개 추천합니다.
+
+        섭취량(intake)이 평균보다 GAP_MATCH_MIN 이상 부족한 영양소의 제품도 후보가 됩니다.
+
+        profile: {'symptoms': [...], 'purposes': [...], 'diseases': [...],
+                  'gender': '남자', 'intake': {통계 키: 섭취량}}  (gender/intake 는 선택)
+        반환값: (recommendations, warnings)
+            recommendations: [(nutrient, Product, score), ...]  (적합도 내림차순)
+            warnings: [{'nutrient', 'name', 'reason', 'msg', 'score'}, ...]
+        질환과 겹쳐 제외된 제품은 warnings 로 가며, 역시 적합도 상위 top_k 개만 담습니다.
+        top_k=None 이면 개수 제한이 없습니다.
+        """
+        match = self.match(profile)
+        matched, risky, risk_cols, _, _ = match
+        gaps = self.intake_gaps(profile, stat_index)
+        scores = self.score(profile, stat_index, match, gaps)
+        if gaps is not None:
+            matched = matched | (gaps >= GAP_MATCH_MIN)
+
+        warnings = []
+        for row in top_k_indices(scores, matched & risky, top_k):
+            product = self.products[self.keys[row]]
+            hit = risk_cols[self.contra_matrix[row, risk_cols]]
+            warnings.append({
+                'nutrient': product.key,
+                'name': product.name,
+                'reason': [self.diseases[i] for i in sorted(hit)],
+                'msg': product.risk_msg,
+                'score': int(scores[row]),
+            })
+
+        recommendations = [
+            (self.keys[row], self.products[self.keys[row]], int(scores[row]))
+            for row in top_k_indices(scores, matched & ~risky, top_k)
+        ]
+        return recommendations, warnings
+
+    def check_interactions(self, keys):
+        """함께 처방된 제품들 사이의 상호작용을 한 번의 행렬 조회로 찾습니다.
+
+        keys: 제품 key 목록 (예: recommend() 결과의 nutrient 들)
+        반환값: [{'a', 'b', 'a_name', 'b_name', 'kind', 'msg', 'separate_hours'}, ...]
+            (keys 순서 기준으로 a 가 b 보다 앞, 주의(conflict) 항목이 먼저)
+        """
+        rows = np.fromiter((self.key_ids[k] for k in keys if k in self.key_ids), dtype=np.intp)
+        if len(rows) < 2 or not self.interactions:
+            return []
+        ids = self.product_stat_ids[rows]
+        pairs = self.interaction_matrix[np.ix_(ids, ids)]
+        left, right = np.nonzero(np.triu(pairs >= 0, k=1))
+
+        found = []
+        for i, j in zip(left, right):
+            interaction = self.interactions[pairs[i, j]]
+            a, b = self.products[self.keys[rows[i]]], self.products[self.keys[rows[j]]]
+            found.append({
+                'a': a.key,
+                'b': b.key,
+                'a_name': a.name,
+                'b_name': b.name,
+                'kind': interaction.kind,
+                'msg': interaction.msg,
+                'separate_hours': interaction.separate_hours,
+            })
+        found.sort(key=lambda item: item['kind'] != 'conflict')
+        return found
+
+
+# --- 처방 결과 메모이제이션 ---
+def profile_key(profile, top_k=DEFAULT_TOP_K):
+    """순서와 중복에 무관한 정규화 키. 같은 조합이면 선택 순서가 달라도 같은 키가 됩니다."""
+    intake = profile.get('intake') or {}
+    return (
+        profile.get('gender', '남자'),
+        frozenset(profile.get('diseases', ())),
+        frozenset(profile.get('symptoms', ())),
+        frozenset(profile.get('purposes', ())),
+        frozenset(intake.items()),
+        top_k,
+    )
+
+
+class PrescriptionCache:
+    """서버 프로세스 안의 모든 세션이 함께 쓰는 LRU + TTL 처방 결과 캐시.
+
+    카탈로그(engine.version)나 통계표(stat_index.version) 버전이 바뀌면
+    통째로 비웁니다. 적중/실패/축출 횟수는 stats() 로 확인합니다.
+    """
+
+    def __init__(self, maxsize=1024, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def recommend(self, profile, engine=None, stat_index=None, top_k=DEFAULT_TOP_K):
+        """recommend() 와 같은 결과를 돌려주되, 같은 프로필이면 캐시에서 꺼냅니다."""
+        if engine is None:
+            engine = default_engine()
+        versions = (engine.version, getattr(stat_index, 'version', None))
+        key = profile_key(profile, top_k)
+        now = time.monotonic()
+
+        with self._lock:
+            if versions != self._versions:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self._versions = versions
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if now - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+        perf.note_miss()
+
+        # 계산은 잠금 밖에서 한다 (같은 키가 동시에 들어오면 두 번 계산될 수 있지만 결과는 같다)
+        result = engine.recommend(profile, stat_index, top_k)
+
+        with self._lock:
+            if versions == self._versions:
+                self._entries[key] = (now, result)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+_watcher = None
+
+
+def default_engine():
+    """products.json 에서 컴파일한 엔진. 파일이 바뀌면 새 엔진으로 교체됩니다."""
+    global _watcher
+    if _watcher is None:
+        _watcher = catalog.CatalogWatcher(build=CatalogEngine)
+    return _watcher.current()
+
+
+def recommend(profile, engine=None, stat_index=None, top_k=DEFAULT_TOP_K):
+    """UI 와 배치 처리에서 공통으로 쓰는 추천 진입점 (부수 효과 없음)."""
+    if engine is None:
+        engine = default_engine()
+    return engine.recommend(profile, stat_index, top_k)
@@ -0,0 +1,161 @@
+"""처방 결과 카드 HTML 렌더링.
+
+카드 템플릿은 import 시 한 번만 정리(들여쓰기/빈 줄 제거)해 두고, 결과 전체를
+한 번에 이어 붙여 st.markdown 한 번으로 보냅니다. 카드 수와 관계없이 클릭당
+브라우저로 가는 메시지 수가 일정합니다.
+
+카탈로그(products.json)는 배포 없이 편집되므로 제품 필드는 모두 html.escape 를
+거쳐 넣고, 링크는 http(s) 만 허용합니다 (safe_link).
+"""
+import html
+from itertools import islice
+from urllib.parse import urlsplit
+
+
+def _text(value):
+    return html.escape(str(value), quote=False)
+
+
+def safe_link(url):
+    """http(s) 링크만 href 속성값으로 이스케이프해 돌려줍니다 (그 밖의 스킴은 '#')."""
+    url = url.strip()
+    if urlsplit(url).scheme.lower() not in ('http', 'https'):
+        return '#'
+    return html.escape(url, quote=True)
+
+
+def _compile(template):
+    # 줄 앞 공백과 빈 줄을 없애 여러 카드를 이어 붙여도 하나의 HTML 블록으로
+    # 해석되게 한다 (들여쓴 줄이 마크다운 코드 블록으로 바뀌는 것 방지)
+    lines = (line.strip() for line in template.strip().splitlines())
+    return '\n'.join(line for line in lines if line).format
+
+
+_warning_card = _compile("""
+    <div class="custom-card warning-card">
+        <h4 style="margin: 0;">🚫 <b>{nutrient}</b> 복용 주의</h4>
+        <p style="margin-top: 10px;">
+            <b>감지된 위험 요인:</b> <span style="font-weight: bold;">{reason}</span><br>
+            <br>
+            <b>닥터 코멘트:</b> {msg}
+        </p>
+    </div>
+""")
+
+_prescription_card = _compile("""
+    <div class="custom-card prescription-card">
+        <div style="display: flex; justify-content: space-between; align-items: center;">
+            <h3 style="margin: 0; font-size: 1.2rem;">💊 {name} <span style="font-size: 0.8em; color: gray;">({nutrient})</span></h3>
+            <span style="background-color: #c6f6d5; color: #22543d; padding: 5px 10px; border-radius: 15px; font-size: 0.8em; font-weight: bold;">적합도 {score}%</span>
+        </div>
+        <hr style="border: 0; border-top: 1px dashed #cbd5e0; margin: 15px 0;">
+        <div style="display: flex; flex-wrap: wrap;">
+            <div style="flex: 2; min-width: 250px; margin-right: 20px;">
+                <p><b>🩺 효능/효과:</b> {detail}</p>
+                <p><b>📊 데이터 분석:</b> {stat_msg}</p>
+            </div>
+            <div style="flex: 1; min-width: 200px; padding: 15px; border-radius: 10px; background-color: #f0fff4;">
+                <p style="margin: 0 0 10px 0; color: #2f855a !important; font-weight:bold;">⏰ 섭취 가이드</p>
+                <ul style="margin: 0; padding-left: 20px; font-size: 0.9em; color: #2d3748;">
+                    <li>권장량: {dosage_daily}</li>
+                    <li>방법: {directions}</li>{timing}
+                </ul>
+            </div>
+        </div>
+        <div style="margin-top: 15px; text-align: right;">
+            <a href="{link}" target="_blank" rel="noopener noreferrer" style="text-decoration: none; font-weight: bold; color: #38a169;">🛒 최저가 구매하러 가기 ></a>
+        </div>
+    </div>
+""")
+
+_interaction_card = _compile("""
+    <div class="custom-card interaction-card {kind}">
+        <h4 style="margin: 0;">{icon} <b>{a_name} + {b_name}</b> {label}</h4>
+        <p style="margin-top: 10px;">{msg}{timing}</p>
+    </div>
+""")
+
+# 상호작용 종류별 (아이콘, 제목)
+INTERACTION_LABELS = {
+    'conflict': ('⚠️', '함께 복용 주의'),
+    'synergy': ('🤝', '함께 복용 추천'),
+}
+
+_timing_item = '<li>복용 간격: {name} 와(과) {hours}시간 이상</li>'.format
+
+_link_list = _compile("""
+    <div class="custom-card">
+        <h4>🌐 온라인 공식 판매처</h4>
+        <p>품질이 검증된 제품의 온라인 최저가를 확인하세요.</p>
+        <ul>{items}</ul>
+    </div>
+""")
+
+_link_item = '<li><a href="{link}" target="_blank" rel="noopener noreferrer">{name}</a></li>'.format
+
+
+def stat_message(stat_index, gender, product):
+    val = stat_index.mean(gender, product.stat_keyword)
+    if val is None:
+        return "분석 데이터 부족"
+    return f"한국 {gender} 평균: {val}"
+
+
+def warning_cards(warnings):
+    return '\n'.join(
+        _warning_card(nutrient=_text(w['nutrient']), reason=_text(', '.join(w['reason'])), msg=_text(w['msg']))
+        for w in warnings
+    )
+
+
+def interaction_cards(interactions):
+    cards = []
+    for item in interactions:
+        icon, label = INTERACTION_LABELS[item['kind']]
+        timing = f"<br><br><b>⏰ {item['separate_hours']}시간 이상 간격을 두고 드세요.</b>" if item['separate_hours'] else ''
+        cards.append(_interaction_card(kind=item['kind'], icon=icon, label=label, a_name=_text(item['a_name']),
+                                       b_name=_text(item['b_name']), msg=_text(item['msg']), timing=timing))
+    return '\n'.join(cards)
+
+
+def _timing_notes(interactions):
+    """제품 key -> 처방 카드 섭취 가이드에 덧붙일 복용 간격 항목 HTML."""
+    notes = {}
+    for item in interactions:
+        if item['separate_hours']:
+            for key, other in ((item['a'], item['b_name']), (item['b'], item['a_name'])):
+                notes[key] = notes.get(key, '') + _timing_item(name=_text(other), hours=item['separate_hours'])
+    return notes
+
+
+def prescription_cards(recommendations, stat_index, gender, interactions=()):
+    timing = _timing_notes(interactions)
+    return '\n'.join(
+        _prescription_card(name=_text(product.name), nutrient=_text(nutrient), score=score,
+                           detail=_text(product.detail), dosage_daily=_text(product.dosage_daily),
+                           directions=_text(product.directions), link=safe_link(product.link),
+                           stat_msg=_text(stat_message(stat_index, gender, product)),
+                           timing=timing.get(nutrient, ''))
+        for nutrient, product, score in recommendations
+    )
+
+
+def prescription_result(recommendations, warnings, stat_index, gender, interactions=()):
+    """경고 카드, 상호작용 카드, 처방 카드를 하나의 HTML 문자열로 만듭니다."""
+    return '\n'.join(part for part in (
+        warning_cards(warnings),
+        interaction_cards(interactions),
+        prescription_cards(recommendations, stat_index, gender, interactions),
+    ) if part)
+
+
+def page_count(total, page_size):
+    return max(1, -(-total // page_size))
+
+
+def link_list(products, page=1, page_size=None):
+    """구매처 목록 카드. page_size 가 있으면 해당 페이지 제품만 담습니다."""
+    if page_size:
+        start = (page - 1) * page_size
+        products = islice(products, start, start + page_size)
+    return _link_list(items=''.join(_link_item(link=safe_link(p.link), name=_text(p.name)) for p in products))
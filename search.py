@@ -0,0 +1,190 @@
+"""자유 입력 증상 검색.
+
+"눈이 뻑뻑해요" 처럼 문진표 목록에 없는 표현을 카탈로그의 증상/목적으로
+바꿔 줍니다. 증상/목적 이름, 동의어 표(catalog.synonyms), 그 증상/목적을 가진
+제품의 설명(desc, detail)을 글자 2-gram 과 한글 자모 3-gram 으로 쪼개 역색인을
+한 번만 만들어 두고, 질의는 질의에 나온 n-gram 의 포스팅 목록만 읽어
+IDF 가중 겹침 계수(짧은 쪽이 긴 쪽에 얼마나 들어 있는지)로 순위를 매깁니다.
+긴 문장 속의 짧은 증상 이름, 긴 제품 설명 속의 짧은 질의 모두 높은 점수를
+받습니다. 자모 단위로도 비교하므로 받침이나
+모음 하나가 틀린 오타, 어미가 다른 표현("침침해요" / "침침함")도 찾습니다.
+
+색인은 카탈로그 버전마다 한 번만 만들어 캐시합니다 (app.py 의 symptom_index).
+"""
+import math
+import re
+
+import numpy as np
+
+import perf
+
+# 동의어/이름은 그대로, 제품 설명은 이 비율만큼만 점수에 반영한다.
+# 설명 하나가 그 제품의 모든 증상/목적으로 퍼지므로, 설명으로 찾은 결과는
+# 이름/동의어로 찾은 결과가 하나도 없을 때만 쓴다
+DESCRIPTION_WEIGHT = 0.5
+# 이 점수(0~1) 미만의 결과는 버린다
+MIN_SCORE = 0.45
+DEFAULT_LIMIT = 5
+
+# --- 한글 정규화 / n-gram ---
+_CHO = 'ㄱㄲㄴㄷㄸㄹㅁㅂㅃㅅㅆㅇㅈㅉㅊㅋㅌㅍㅎ'
+_JUNG = 'ㅏㅐㅑㅒㅓㅔㅕㅖㅗㅘㅙㅚㅛㅜㅝㅞㅟㅠㅡㅢㅣ'
+_JONG = ('', 'ㄱ', 'ㄲ', 'ㄳ', 'ㄴ', 'ㄵ', 'ㄶ', 'ㄷ', 'ㄹ', 'ㄺ', 'ㄻ', 'ㄼ', 'ㄽ', 'ㄾ', 'ㄿ', 'ㅀ',
+         'ㅁ', 'ㅂ', 'ㅄ', 'ㅅ', 'ㅆ', 'ㅇ', 'ㅈ', 'ㅊ', 'ㅋ', 'ㅌ', 'ㅍ', 'ㅎ')
+# 완성형 음절 11,172 자 -> 초성+중성+종성 (str.translate 한 번으로 분해한다)
+_JAMO = {
+    0xAC00 + i: _CHO[i // 588] + _JUNG[i % 588 // 28] + _JONG[i % 28]
+    for i in range(11172)
+}
+# 띄어쓰기는 사람마다 달라서 공백과 문장 부호는 모두 지우고 비교한다
+_NOISE = re.compile(r'[^0-9a-z가-힣ㄱ-ㅣ]+')
+
+
+def normalize(text):
+    return _NOISE.sub('', text.lower())
+
+
+def to_jamo(text):
+    return text.translate(_JAMO)
+
+
+def ngrams(text):
+    """정규화한 글자 2-gram 과 자모 3-gram 집합."""
+    chars = normalize(text)
+    if len(chars) == 1:
+        grams = {chars}
+    else:
+        grams = {chars[i:i + 2] for i in range(len(chars) - 1)}
+    jamo = to_jamo(chars)
+    grams.update(jamo[i:i + 3] for i in range(len(jamo) - 2))
+    return grams
+
+
+# --- 색인 ---
+class SymptomIndex:
+    """증상/목적을 문서로 하는 n-gram 역색인. 카탈로그 버전마다 한 번만 만듭니다.
+
+    문서 번호는 엔진과 같습니다: 0..len(symptoms)-1 은 engine.symptom_ids,
+    그 뒤는 len(symptoms) + engine.purpose_ids. 문서마다 여러 '표현'(이름,
+    동의어, 제품 설명)이 있고, 문서 점수는 가장 잘 맞은 표현의 점수입니다.
+    """
+
+    def __init__(self, engine):
+        self.version = engine.version
+        self.symptoms = engine.symptoms
+        self.purposes = engine.purposes
+        self.terms = list(engine.symptoms) + list(engine.purposes)
+        doc_ids = {('symptom', t): i for i, t in enumerate(engine.symptoms)}
+        doc_ids.update({('purpose', t): len(engine.symptoms) + i for i, t in enumerate(engine.purposes)})
+
+        # (문서, 표현, 가중치) 목록. 같은 문서의 같은 표현은 한 번만 넣는다
+        entries = {}
+        for (kind, term), doc in doc_ids.items():
+            entries[doc, term] = 1.0
+            for phrase in engine.catalog.synonyms.get(term, ()):
+                entries[doc, phrase] = 1.0
+        for product in engine.products.values():
+            docs = [doc_ids['symptom', t] for t in product.symptoms] + \
+                   [doc_ids['purpose', t] for t in product.purposes]
+            for doc in docs:
+                for text in (product.desc, product.detail):
+                    entries.setdefault((doc, text), DESCRIPTION_WEIGHT)
+
+        self.entry_doc = np.fromiter((doc for doc, _ in entries), dtype=np.intp, count=len(entries))
+        self.entry_text = [text for _, text in entries]
+        self.entry_weight = np.fromiter(entries.values(), dtype=float, count=len(entries))
+
+        # n-gram -> 표현 번호 포스팅 목록 (CSR: postings[offsets[g]:offsets[g + 1]]).
+        # 한 글자 질의('눈', '피')도 찾도록 글자 1-gram 도 색인하지만, 두 글자 이상
+        # 질의에는 나오지 않으므로 표현의 크기(entry_mass)에는 ngrams() 결과만 센다
+        self.gram_ids = {}
+        rows, cols, scored = [], [], []
+        for entry, text in enumerate(self.entry_text):
+            grams = ngrams(text)
+            for gram in grams | set(normalize(text)):
+                rows.append(self.gram_ids.setdefault(gram, len(self.gram_ids)))
+                cols.append(entry)
+                scored.append(gram in grams)
+        rows = np.array(rows, dtype=np.intp)
+        cols = np.array(cols, dtype=np.intp)
+        order = np.argsort(rows, kind='stable')
+        self.postings = cols[order]
+        counts = np.bincount(rows, minlength=len(self.gram_ids))
+        self.offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        # 흔한 n-gram (예: '해요', '줍니다') 일수록 가볍게 본다
+        n_entries = len(self.entry_text)
+        self.idf = np.log((1 + n_entries) / (1 + counts)) + 1.0
+        self.max_idf = math.log(1 + n_entries) + 1.0
+        scored = np.array(scored, dtype=bool)
+        self.entry_mass = np.bincount(cols[scored], weights=self.idf[rows[scored]] ** 2, minlength=n_entries)
+
+    def __len__(self):
+        return len(self.terms)
+
+    def doc(self, doc):
+        """문서 번호 -> ('symptom' | 'purpose', 용어)."""
+        if doc < len(self.symptoms):
+            return 'symptom', self.symptoms[doc]
+        return 'purpose', self.purposes[doc - len(self.symptoms)]
+
+    def search(self, query, limit=DEFAULT_LIMIT, min_score=MIN_SCORE):
+        """자유 입력 질의에 맞는 증상/목적을 점수 순으로 최대 limit 개 찾습니다.
+
+        반환값: [{'kind', 'term', 'id', 'score', 'via'}, ...]
+            kind: 'symptom' | 'purpose', id: 엔진의 symptom_ids / purpose_ids 번호,
+            score: 0~1, via: 가장 잘 맞은 표현 (이름, 동의어 또는 제품 설명)
+        """
+        grams = ngrams(query)
+        known = [self.gram_ids[g] for g in grams if g in self.gram_ids]
+        if not known:
+            return []
+        known = np.array(known, dtype=np.intp)
+        weights = self.idf[known] ** 2
+        # 색인에 없는 n-gram 도 질의 크기에는 넣어, 엉뚱한 문장이 높은 점수를 받지 않게 한다
+        query_mass = weights.sum() + (len(grams) - len(known)) * self.max_idf ** 2
+
+        starts, ends = self.offsets[known], self.offsets[known + 1]
+        hits = np.concatenate([self.postings[s:e] for s, e in zip(starts, ends)])
+        shared = np.bincount(hits, weights=np.repeat(weights, ends - starts), minlength=len(self.entry_text))
+
+        candidates = np.flatnonzero(shared)
+        shared, mass = shared[candidates], self.entry_mass[candidates]
+        scores = self.entry_weight[candidates] * shared / np.minimum(mass, query_mass)
+        direct = self.entry_weight[candidates] == 1.0
+        if (scores[direct] >= min_score).any():
+            scores[~direct] = 0.0
+        # 점수가 같으면 (예: 둘 다 질의를 온전히 포함) 길이까지 비슷한 쪽(코사인)을 앞에 둔다
+        cosine = shared / np.sqrt(mass * query_mass)
+        results, seen = [], set()
+        for i in np.lexsort((-cosine, -scores)):
+            if scores[i] < min_score or len(results) >= limit:
+                break
+            entry = candidates[i]
+            doc = int(self.entry_doc[entry])
+            if doc in seen:
+                continue
+            seen.add(doc)
+            kind, term = self.doc(doc)
+            results.append({
+                'kind': kind,
+                'term': term,
+                'id': doc if kind == 'symptom' else doc - len(self.symptoms),
+                'score': round(float(scores[i]), 3),
+                'via': self.entry_text[entry],
+            })
+        return results
+
+
+def profile_terms(hits):
+    """search() 결과(또는 그중 사용자가 고른 것)를 추천 엔진 profile 형식
+    {'symptoms': [...], 'purposes': [...]} 으로 나눕니다."""
+    found = {'symptoms': [], 'purposes': []}
+    for hit in hits:
+        found[hit['kind'] + 's'].append(hit['term'])
+    return found
+
+
+@perf.timed('search.build_index')
+def build_index(engine):
+    return SymptomIndex(engine)
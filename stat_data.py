@@ -0,0 +1,583 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from pyarrow import feather
+
+import perf
+
+logger = logging.getLogger(__name__)
+
+# --- 국민건강영양조사 통계 데이터 ---
+STAT_PATH = 'supplements.csv'
+SUBTOTAL = '소계'
+# 마지막 load_stat_data() 실패 사유 (성공하면 None). 화면의 '데이터 로드 실패' 안내에 쓴다
+last_error = None
+
+# '비타민C (mg)' -> '비타민C' (단위 괄호 제거)
+_UNIT_PATTERN = re.compile(r'\s*\((.*)\)\s*$')
+
+
+def nutrient_key(label):
+    """통계표의 영양소 이름에서 단위 표기를 떼어낸 정규화 키를 반환합니다."""
+    return _UNIT_PATTERN.sub('', str(label)).strip()
+
+
+def nutrient_unit(label):
+    """'비타민C (mg)' -> 'mg', 단위가 없으면 빈 문자열."""
+    found = _UNIT_PATTERN.search(str(label))
+    return found.group(1) if found else ''
+
+
+# 통계표 열 이름
+YEAR_COL = '연도'
+GENDER_COL = '성별(1)'
+AGE_COL = '연령별(1)'
+NUTRIENT_COL = '영양소별(1)'
+SUB_COL = '영양소별(2)'
+VALUE_COLS = ('평균', '표준오차')
+TOTAL = '전체'
+
+# 통계표 스키마 (열 순서대로). 범주형 열은 category, 수치 열은 float32 로 저장한다.
+STAT_SCHEMA = [
+    (YEAR_COL, 'category'),
+    (GENDER_COL, 'category'),
+    (AGE_COL, 'category'),
+    (NUTRIENT_COL, 'category'),
+    (SUB_COL, 'category'),
+    ('평균', 'float32'),
+    ('표준오차', 'float32'),
+]
+SNAPSHOT_DIR = '.stat_cache'
+
+
+def _clean(label):
+    return str(label).replace('"', '').strip()
+
+
+def _parse_csv(path):
+    try:
+        raw = pd.read_csv(path, header=None, encoding='cp949', dtype=str)
+        encoding = 'cp949'
+    except UnicodeDecodeError:
+        raw = pd.read_csv(path, header=None, encoding='utf-8', dtype=str)
+        encoding = 'utf-8'
+
+    return apply_schema(melt_years(raw)), encoding
+
+
+def melt_years(raw):
+    """KOSIS 내려받기 형식(1행: 시점, 2행: 항목)의 표를 연도별 long-format 으로 펼칩니다.
+
+    '2022 평균, 2022 표준오차, 2023 평균, ...' 처럼 시점마다 반복되는 열 묶음을
+    (연도, 평균, 표준오차) 행으로 바꿉니다. 연령별 열이 없는 표는 '전체' 연령으로 채웁니다.
+    """
+    years = [_clean(c) for c in raw.iloc[0]]
+    names = [_clean(c) for c in raw.iloc[1]]
+    body = raw.iloc[2:].reset_index(drop=True)
+
+    id_cols = [i for i, name in enumerate(names) if name not in VALUE_COLS]
+    ids = body.iloc[:, id_cols].set_axis([names[i] for i in id_cols], axis=1)
+    if AGE_COL not in ids:
+        ids[AGE_COL] = TOTAL
+
+    frames = []
+    for year in dict.fromkeys(years[i] for i, name in enumerate(names) if name in VALUE_COLS):
+        frame = ids.copy()
+        frame[YEAR_COL] = year
+        for value in VALUE_COLS:
+            cols = [i for i, name in enumerate(names) if name == value and years[i] == year]
+            frame[value] = body.iloc[:, cols[0]] if cols else None
+        frames.append(frame)
+    if not frames:
+        raise ValueError(f"통계표에 평균/표준오차 열이 없습니다: {names}")
+    return pd.concat(frames, ignore_index=True)
+
+
+def apply_schema(df):
+    """STAT_SCHEMA 와 열 이름을 대조하고 선언된 dtype 으로 변환합니다."""
+    expected = [name for name, _ in STAT_SCHEMA]
+    missing = [name for name in expected if name not in df.columns]
+    if missing:
+        raise ValueError(f"통계표 열 구성이 스키마와 다릅니다 (없는 열 {missing}): {list(df.columns)}")
+
+    df = df[expected].copy()
+    for name, dtype in STAT_SCHEMA:
+        if dtype == 'category':
+            df[name] = df[name].astype(str).str.strip().astype('category')
+        else:
+            df[name] = pd.to_numeric(df[name], errors='coerce').astype(dtype)
+    return df
+
+
+# --- 바이너리 스냅샷 ---
+def _file_sha1(path):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _snapshot_paths(path):
+    base = os.path.join(os.path.dirname(os.path.abspath(path)), SNAPSHOT_DIR, os.path.basename(path))
+    return base + '.feather', base + '.json'
+
+
+def _fresh_snapshot(path):
+    """원본과 일치하는 스냅샷 파일 경로, 없거나 낡았으면 None."""
+    data_path, meta_path = _snapshot_paths(path)
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if meta.get('schema') != [list(col) for col in STAT_SCHEMA]:
+        return None
+    if not os.path.exists(data_path):
+        return None
+
+    src = os.stat(path)
+    if (meta.get('size'), meta.get('mtime_ns')) != (src.st_size, src.st_mtime_ns):
+        # 크기/시각이 달라졌으면 내용 해시로 한 번 더 확인 (배포 시 touch 만 된 경우)
+        if meta.get('sha1') != _file_sha1(path):
+            return None
+        meta.update(size=src.st_size, mtime_ns=src.st_mtime_ns)
+        try:
+            _write_json(meta_path, meta)
+        except OSError:
+            pass
+    return data_path
+
+
+def _replace_atomically(path, write):
+    """write(tmp) 로 같은 디렉터리의 임시 파일에 쓴 뒤 path 로 교체합니다.
+
+    임시 파일 이름은 호출마다 고유하므로, 배포 직후 여러 워커 프로세스가 동시에
+    스냅샷을 만들어도 서로 반쯤 쓴 파일을 덮어쓰거나 옮기지 않습니다.
+    """
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                               prefix=os.path.basename(path) + '.', suffix='.tmp')
+    os.close(fd)
+    try:
+        write(tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _write_json(path, obj):
+    def write(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, ensure_ascii=False)
+    _replace_atomically(path, write)
+
+
+def _to_arrow(df):
+    # 메모리 매핑 후 복사 없이 NumPy 로 볼 수 있도록 null 없는 배열로 만든다
+    # (pandas 의 to_feather 는 NaN 을 null 로 바꿔 zero-copy 읽기가 안 된다)
+    arrays = {}
+    for name, dtype in STAT_SCHEMA:
+        col = df[name]
+        if dtype == 'category':
+            arrays[name] = pa.DictionaryArray.from_arrays(
+                pa.array(col.cat.codes.to_numpy()), pa.array(list(col.cat.categories), type=pa.string()))
+        else:
+            arrays[name] = pa.array(col.to_numpy())
+    return pa.table(arrays)
+
+
+def _write_snapshot(path, df, encoding):
+    data_path, meta_path = _snapshot_paths(path)
+    try:
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+        table = _to_arrow(df)
+        _replace_atomically(data_path, lambda tmp: feather.write_feather(table, tmp, compression='uncompressed'))
+        src = os.stat(path)
+        _write_json(meta_path, {
+            'size': src.st_size,
+            'mtime_ns': src.st_mtime_ns,
+            'sha1': _file_sha1(path),
+            'encoding': encoding,
+            'schema': [list(col) for col in STAT_SCHEMA],
+        })
+    except OSError:
+        # 읽기 전용 배포 등으로 스냅샷을 못 쓰면 CSV 결과만 사용한다
+        pass
+
+
+@perf.timed('stat_data.load_stat_data')
+def load_stat_data(path=STAT_PATH, use_snapshot=True):
+    """통계표를 DataFrame 으로 읽습니다. 원본이 바뀌지 않았으면 Feather 스냅샷을 바로 읽습니다.
+
+    읽기에 실패하면 빈 DataFrame 을 반환하고, 사유(스키마 검증 실패 등)는 로그와
+    last_error 에 남깁니다.
+    """
+    global last_error
+    last_error = None
+    try:
+        if use_snapshot:
+            data_path = _fresh_snapshot(path)
+            if data_path is not None:
+                return pd.read_feather(data_path)
+
+        df, encoding = _parse_csv(path)
+        if use_snapshot:
+            _write_snapshot(path, df, encoding)
+        return df
+    except Exception as e:
+        last_error = f"{path}: {e}"
+        logger.warning("통계표를 읽지 못했습니다: %s", last_error)
+        return pd.DataFrame()
+
+
+# --- 공유 읽기 전용 저장소 ---
+def _frozen(array):
+    array.flags.writeable = False
+    return array
+
+
+class StatStore:
+    """서버 프로세스당 한 번 적재해 모든 세션이 함께 쓰는 읽기 전용 통계표.
+
+    범주형 열은 (categories, int codes), 수치 열은 float32 배열로 들고 있고
+    모든 배열은 쓰기 금지 상태입니다. from_feather 는 스냅샷 파일을 메모리
+    매핑하므로 같은 머신의 여러 워커 프로세스가 같은 페이지를 공유합니다.
+    """
+
+    __slots__ = ('columns', 'categories', 'arrays', 'version')
+
+    def __init__(self, categories, arrays):
+        self.columns = [name for name, _ in STAT_SCHEMA] if arrays else []
+        self.categories = categories
+        self.arrays = arrays
+        self.version = self._content_hash()
+
+    @classmethod
+    def from_frame(cls, df):
+        if df.empty:
+            return cls({}, {})
+        categories, arrays = {}, {}
+        for name, dtype in STAT_SCHEMA:
+            if dtype == 'category':
+                categories[name] = tuple(df[name].cat.categories)
+                arrays[name] = _frozen(df[name].cat.codes.to_numpy().copy())
+            else:
+                arrays[name] = _frozen(df[name].to_numpy(dtype=dtype).copy())
+        return cls(categories, arrays)
+
+    @classmethod
+    def from_feather(cls, path):
+        table = feather.read_table(path, memory_map=True)
+        categories, arrays = {}, {}
+        for name, dtype in STAT_SCHEMA:
+            col = table.column(name)
+            col = col.chunk(0) if col.num_chunks == 1 else col.combine_chunks()
+            if dtype == 'category':
+                categories[name] = tuple(col.dictionary.to_pylist())
+                arrays[name] = col.indices.to_numpy(zero_copy_only=True)
+            else:
+                arrays[name] = col.to_numpy(zero_copy_only=True)
+        return cls(categories, arrays)
+
+    def __len__(self):
+        return len(self.arrays[self.columns[0]]) if self.columns else 0
+
+    def column(self, name):
+        return self.arrays[name]
+
+    def labels(self, name):
+        """범주형 열을 행별 문자열 배열로 펼칩니다 (코드 -1 은 None)."""
+        lookup = np.array(self.categories[name] + (None,), dtype=object)
+        return lookup[self.arrays[name]]
+
+    def to_frame(self):
+        """분석용 DataFrame 사본을 만듭니다."""
+        if not self.columns:
+            return pd.DataFrame()
+        data = {}
+        for name, dtype in STAT_SCHEMA:
+            if dtype == 'category':
+                data[name] = pd.Categorical.from_codes(self.arrays[name], categories=self.categories[name])
+            else:
+                data[name] = self.arrays[name].copy()
+        return pd.DataFrame(data)
+
+    def _content_hash(self):
+        if not self.columns:
+            return 'empty'
+        digest = hashlib.sha1()
+        for name in self.columns:
+            digest.update(name.encode('utf-8'))
+            digest.update('|'.join(self.categories.get(name, ())).encode('utf-8'))
+            digest.update(np.ascontiguousarray(self.arrays[name]).tobytes())
+        return digest.hexdigest()[:16]
+
+
+@perf.timed('stat_data.load_stat_store')
+def load_stat_store(path=STAT_PATH, memory_map=True):
+    """StatStore 를 적재합니다. 가능하면 최신 스냅샷을 메모리 매핑합니다."""
+    df = None
+    data_path = _fresh_snapshot(path) if os.path.exists(path) else None
+    if data_path is None:
+        df = load_stat_data(path)
+        data_path = _fresh_snapshot(path) if not df.empty else None
+
+    if memory_map and data_path is not None:
+        try:
+            return StatStore.from_feather(data_path)
+        except Exception:
+            pass
+
+    if df is None:
+        df = load_stat_data(path)
+    return StatStore.from_frame(df)
+
+
+def _as_float(value):
+    # float32 -> float 변환 시 생기는 꼬리(10.600000381...)를 없애기 위해
+    # float32 의 최단 표기를 거쳐서 넓힌다
+    return float(str(np.float32(value)))
+
+
+# '30-49세' -> (30, 49), '65세 이상' -> (65, inf)
+_AGE_RANGE = re.compile(r'(\d+)\s*세?\s*[-~]\s*(\d+)')
+_AGE_OPEN = re.compile(r'(\d+)\s*세?\s*이상')
+
+
+def age_range(label):
+    """연령대 이름의 (하한, 상한) 나이, 구간이 아니면('전체' 등) None."""
+    found = _AGE_RANGE.search(label)
+    if found:
+        return int(found.group(1)), int(found.group(2))
+    found = _AGE_OPEN.search(label)
+    if found:
+        return int(found.group(1)), float('inf')
+    return None
+
+
+def _year_order(label):
+    digits = re.match(r'\d+', label)
+    return (0, int(digits.group()), label) if digits else (1, 0, label)
+
+
+def _axis(store, column, normalize=None, sort_key=None):
+    """(축 라벨 목록, 범주 코드 -> 축 위치 변환표).
+
+    라벨은 파일에 처음 나온 순서를 따르고(sort_key 가 있으면 그 순서), normalize
+    결과가 같은 범주는 한 위치로 합칩니다. 변환표의 마지막 칸은 결측 코드 -1 용입니다.
+    """
+    categories = store.categories[column]
+    codes = store.column(column)
+    used, first = np.unique(codes[codes >= 0], return_index=True)
+
+    labels, positions = [], {}
+    remap = np.full(len(categories) + 1, -1, dtype=np.intp)
+    for code in used[np.argsort(first)]:
+        label = normalize(categories[code]) if normalize else categories[code]
+        if label not in positions:
+            positions[label] = len(labels)
+            labels.append(label)
+        remap[code] = positions[label]
+
+    if sort_key is not None:
+        ordered = sorted(labels, key=sort_key)
+        moved = np.array([ordered.index(label) for label in labels] + [-1], dtype=np.intp)
+        remap, labels = moved[remap], ordered
+    return labels, remap
+
+
+# 큐브 축 순서 (StatCube.mean 등의 차원 순서)
+CUBE_AXES = (YEAR_COL, GENDER_COL, AGE_COL, NUTRIENT_COL, SUB_COL)
+
+
+class StatCube:
+    """연도 x 성별 x 연령대 x 영양소 키 x 세부 구분 -> (평균, 표준오차) 배열.
+
+    StatStore 의 범주 코드를 축 위치로 한 번만 바꿔 5차원 float32 배열에 채워
+    둡니다. 한 시점/연령대의 단면(section)이나 한 영양소의 연도별 추이(series)는
+    문자열 마스크 없이 배열 인덱싱으로 읽습니다. 같은 칸에 단위만 다른 행이
+    여러 개면('비타민A (㎍RE)', '비타민A (㎍RAE)') 평균값이 있는 첫 번째 행을 씁니다.
+    """
+
+    def __init__(self, store):
+        self.version = store.version
+        self._units = {}
+        if not len(store):
+            self.years, self.genders, self.ages, self.nutrients, self.subs = [], [], [], [], []
+            self._index_axes()
+            self.mean = self.se = np.full((0,) * len(CUBE_AXES), np.nan, dtype=np.float32)
+            self.present = np.zeros(self.mean.shape, dtype=bool)
+            return
+
+        axes = [
+            _axis(store, YEAR_COL, sort_key=_year_order),
+            _axis(store, GENDER_COL),
+            _axis(store, AGE_COL),
+            _axis(store, NUTRIENT_COL, normalize=nutrient_key),
+            _axis(store, SUB_COL),
+        ]
+        self.years, self.genders, self.ages, self.nutrients, self.subs = (labels for labels, _ in axes)
+        self._index_axes()
+        shape = tuple(len(labels) for labels, _ in axes)
+        coords = [remap[store.column(column)] for (_, remap), column in zip(axes, CUBE_AXES)]
+
+        # 칸마다 대표 행 하나: 평균값이 있는 행을 먼저, 같은 조건이면 파일 순서
+        mean, se = store.column('평균'), store.column('표준오차')
+        rows = np.flatnonzero(np.logical_and.reduce([c >= 0 for c in coords]))
+        rows = rows[np.argsort(np.isnan(mean[rows]), kind='stable')]
+        flat = np.ravel_multi_index(tuple(c[rows] for c in coords), shape)
+        flat, first = np.unique(flat, return_index=True)
+        rows = rows[first]
+
+        self.mean = np.full(shape, np.nan, dtype=np.float32)
+        self.se = np.full(shape, np.nan, dtype=np.float32)
+        self.present = np.zeros(shape, dtype=bool)
+        self.mean.flat[flat] = mean[rows]
+        self.se.flat[flat] = se[rows]
+        self.present.flat[flat] = True
+        for array in (self.mean, self.se, self.present):
+            array.flags.writeable = False
+
+        # 영양소 단위는 소계 대표 행 중 파일에서 먼저 나온 행의 표기를 따른다
+        sub = self.sub_ids.get(SUBTOTAL)
+        if sub is not None:
+            sub_rows = np.sort(rows[coords[4][rows] == sub])
+            keys, first = np.unique(coords[3][sub_rows], return_index=True)
+            labels = store.labels(NUTRIENT_COL)
+            for key, row in zip(keys, sub_rows[first]):
+                self._units[self.nutrients[key]] = nutrient_unit(labels[row])
+
+    def _index_axes(self):
+        self.year_ids = {label: i for i, label in enumerate(self.years)}
+        self.gender_ids = {label: i for i, label in enumerate(self.genders)}
+        self.age_ids = {label: i for i, label in enumerate(self.ages)}
+        self.nutrient_ids = {label: i for i, label in enumerate(self.nutrients)}
+        self.sub_ids = {label: i for i, label in enumerate(self.subs)}
+
+    def __len__(self):
+        return int(self.present.sum())
+
+    def __bool__(self):
+        return bool(self.present.any())
+
+    @property
+    def latest_year(self):
+        return self.years[-1] if self.years else None
+
+    @property
+    def default_age(self):
+        """연령 구분 없는 기준 연령대: '전체' 가 있으면 '전체', 없으면 첫 연령대."""
+        if TOTAL in self.age_ids:
+            return TOTAL
+        return self.ages[0] if self.ages else None
+
+    def unit(self, nutrient):
+        return self._units.get(nutrient, '')
+
+    def age_band(self, age):
+        """나이가 속하는 가장 좁은 연령대 이름, 연령대별 통계가 없으면 None."""
+        best = None
+        for label in self.ages:
+            bounds = age_range(label)
+            if bounds and bounds[0] <= age <= bounds[1]:
+                if best is None or bounds[1] - bounds[0] < best[0]:
+                    best = (bounds[1] - bounds[0], label)
+        return best[1] if best else None
+
+    def _cell(self, year, gender, age, nutrient, sub):
+        cell = (self.year_ids.get(year), self.gender_ids.get(gender), self.age_ids.get(age),
+                self.nutrient_ids.get(nutrient), self.sub_ids.get(sub))
+        if None in cell or not self.present[cell]:
+            return None
+        return cell
+
+    def get(self, year, gender, age, nutrient, sub=SUBTOTAL):
+        """(평균, 표준오차) 튜플, 없으면 None."""
+        cell = self._cell(year, gender, age, nutrient, sub)
+        if cell is None:
+            return None
+        return _as_float(self.mean[cell]), _as_float(self.se[cell])
+
+    def section(self, year, age):
+        """한 시점/연령대의 (성별 x 영양소 x 세부 구분) 단면 (mean, se, present) 뷰."""
+        yi, ai = self.year_ids[year], self.age_ids[age]
+        return self.mean[yi, :, ai], self.se[yi, :, ai], self.present[yi, :, ai]
+
+    def series(self, gender, nutrient, age=None, sub=SUBTOTAL):
+        """연도별 추이 [(연도, 평균, 표준오차), ...] (값이 없는 연도는 건너뜀)."""
+        ids = (self.gender_ids.get(gender), self.age_ids.get(age or self.default_age),
+               self.nutrient_ids.get(nutrient), self.sub_ids.get(sub))
+        if None in ids:
+            return []
+        gi, ai, ni, si = ids
+        mean, se = self.mean[:, gi, ai, ni, si], self.se[:, gi, ai, ni, si]
+        keep = self.present[:, gi, ai, ni, si] & ~np.isnan(mean)
+        return [(self.years[i], _as_float(mean[i]), _as_float(se[i])) for i in np.flatnonzero(keep)]
+
+
+class StatIndex:
+    """한 시점/연령대 단면의 (성별, 영양소 키, 세부 구분) -> (평균, 표준오차) 조회 테이블.
+
+    매 rerun 마다 DataFrame 전체에 마스크를 씌우던 조회를 딕셔너리 한 번의
+    조회로 바꿉니다. year 를 주지 않으면 최신 연도, age 를 주지 않으면 연령
+    구분 없는 단면을 씁니다. source 는 StatStore 나 이미 만든 StatCube 입니다.
+    """
+
+    def __init__(self, source, year=None, age=None):
+        cube = self.cube = source if isinstance(source, StatCube) else StatCube(source)
+        self.year = year or cube.latest_year
+        self.age = age or cube.default_age
+        self.version = f'{cube.version}:{self.year}:{self.age}'
+        self._entries = {}
+        self.genders = []
+        self.nutrients = []
+        if self.year not in cube.year_ids or self.age not in cube.age_ids:
+            return
+
+        mean, se, present = cube.section(self.year, self.age)
+        for g, n, s in zip(*np.nonzero(present)):
+            key = (cube.genders[g], cube.nutrients[n], cube.subs[s])
+            self._entries[key] = (_as_float(mean[g, n, s]), _as_float(se[g, n, s]))
+        self.genders = [g for i, g in enumerate(cube.genders) if present[i].any()]
+        sub = cube.sub_ids.get(SUBTOTAL)
+        if sub is not None:
+            self.nutrients = [n for i, n in enumerate(cube.nutrients) if present[:, i, sub].any()]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __bool__(self):
+        return bool(self._entries)
+
+    def get(self, gender, nutrient, sub=SUBTOTAL):
+        """(평균, 표준오차) 튜플, 없으면 None."""
+        return self._entries.get((gender, nutrient, sub))
+
+    def mean(self, gender, nutrient, sub=SUBTOTAL, default=None):
+        entry = self._entries.get((gender, nutrient, sub))
+        if entry is None or pd.isna(entry[0]):
+            return default
+        return entry[0]
+
+    def unit(self, nutrient):
+        return self.cube.unit(nutrient)
+
+    def overall_gender(self, default=None):
+        """대시보드 기준 성별: '전체' 행이 있으면 '전체', 없으면 default (없으면 첫 성별)."""
+        if TOTAL in self.genders:
+            return TOTAL
+        if default in self.genders or not self.genders:
+            return default
+        return self.genders[0]